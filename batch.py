@@ -0,0 +1,168 @@
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from puzzleio import (BUDGET_EXHAUSTED, INVALID_PUZZLE, boardFromLine, boxSizeOf, readLines,
+                      formatBoards, writeLines)
+from solver import getSolver
+
+try:
+    import vectorized
+except ImportError:  # NumPy is optional, chunks are then solved board by board
+    vectorized = None
+
+_workerOptions = dict()  # keyword arguments passed to solveGraphColoring
+_workerPresolve = [True]  # run the vectorized propagation on each chunk first
+
+
+def _initWorker(options, boxSizes, presolve=True):
+    """
+    Runs once in every worker process : keeps the solve options and loads
+    the constraint graph of the expected board sizes before the first puzzle.
+    """
+    _workerOptions.clear()
+    _workerOptions.update(options)
+    _workerPresolve[0] = presolve
+    for boxSize in boxSizes:
+        getSolver(boxSize)
+
+
+def solveBoard(board):
+    """
+    solves one board with the worker options, returns the solved board, None
+    when it has no solution or BUDGET_EXHAUSTED when the time / node limit ran out
+    """
+    solver = getSolver(boxSizeOf(len(board) ** 2))
+    color, stats = solver.solveGraphColoring(board, **_workerOptions)
+    if stats.exhausted is not None:
+        return BUDGET_EXHAUSTED
+    if color is None:
+        return None
+    return solver.colorToBoard(color)
+
+
+def solveBoards(boards):
+    """ generator stage of the pipeline : board in, solved board (or None) out """
+    for board in boards:
+        yield solveBoard(board)
+
+
+def presolveBoards(boards):
+    """
+    Propagates a list of boards of the same size in one vectorized step and
+    only searches the ones propagation could not finish.
+    Returns the solved boards (None for no solution) in the same order.
+    """
+    grid, status = vectorized.propagate(boards)
+    solved = []
+    for board, state in zip(grid.tolist(), status):
+        if state == vectorized.SOLVED:
+            solved.append(board)
+        elif state == vectorized.CONTRADICTION:
+            solved.append(None)
+        else:
+            solved.append(solveBoard(board))
+    return solved
+
+
+def solveChunk(lines):
+    """
+    worker task : solves a list of puzzle lines, returns the solution lines.
+    Blank lines are skipped. A line that does not parse gives an INVALID_PUZZLE
+    line with the reason, so one bad line neither stops the run nor shifts
+    the solutions of the lines after it.
+    """
+    boards = []
+    invalid = dict()  # position in the output : error line
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            boards.append(boardFromLine(line))
+        except ValueError as e:
+            invalid[len(boards) + len(invalid)] = INVALID_PUZZLE + " : " + str(e)
+    if (_workerPresolve[0] and vectorized is not None and len(boards) > 1 and
+            len(set(len(board) for board in boards)) == 1):
+        solved = list(formatBoards(presolveBoards(boards)))
+    else:
+        solved = list(formatBoards(solveBoards(boards)))
+    for position in sorted(invalid):
+        solved.insert(position, invalid[position])
+    return solved
+
+
+def _chunks(lines, chunksize):
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def solveStream(lines, workers=None, chunksize=64, window=None, boxSizes=(4,),
+                presolve=True, **options):
+    """
+    Generator pipeline parse -> solve -> format over puzzle lines, yielding
+    the solution lines in input order as soon as they are ready.
+    workers : number of processes (default os.cpu_count()), 1 solves in this process
+    chunksize : puzzles sent to a worker at a time
+    window : most chunks in flight at once (default 4 per worker). Unlike
+             Executor.map the input is only read as far as the window, so
+             memory stays flat whatever the number of puzzles.
+    boxSizes : board sizes whose graph every worker loads up front
+    presolve : when NumPy is installed, propagate each chunk as one stack of
+               boards (see vectorized.propagate) and search only the rest
+    options : passed to SudokuSolver.solveGraphColoring (mode, ordering, timeLimit,
+              nodeLimit, ...). A puzzle that runs out of its budget gives a
+              BUDGET_EXHAUSTED line so one bad board can not hold up a worker.
+    """
+    if workers == 1:
+        _initWorker(options, boxSizes, presolve)
+        for chunk in _chunks(lines, chunksize):
+            for line in solveChunk(chunk):
+                yield line
+        return
+    workers = workers or os.cpu_count() or 1
+    window = window or 4 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker,
+                             initargs=(options, boxSizes, presolve)) as pool:
+        pending = deque()
+        for chunk in _chunks(lines, chunksize):
+            pending.append(pool.submit(solveChunk, chunk))
+            if len(pending) >= window:
+                for line in pending.popleft().result():
+                    yield line
+        while pending:
+            for line in pending.popleft().result():
+                yield line
+
+
+def solveLines(lines, workers=None, chunksize=64, **options):
+    """ Solves puzzle lines and returns the list of solution lines in input order """
+    return list(solveStream(lines, workers=workers, chunksize=chunksize, **options))
+
+
+def solveFile(inPath, outPath, workers=None, chunksize=64, **options):
+    """
+    Streams one puzzle per line from inPath ("-" for stdin) to one solution
+    per line in outPath ("-" for stdout), in the same order.
+    Returns the number of lines written.
+    """
+    return writeLines(solveStream(readLines(inPath), workers=workers,
+                                  chunksize=chunksize, **options), outPath)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a file of puzzles, one per line.")
+    parser.add_argument("input", nargs="?", default="-")
+    parser.add_argument("output", nargs="?", default="-")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=64)
+    parser.add_argument("--mode", default="propagate")
+    parser.add_argument("--time-limit", type=float, help="seconds allowed per puzzle")
+    parser.add_argument("--node-limit", type=int, help="search nodes allowed per puzzle")
+    args = parser.parse_args()
+    solveFile(args.input, args.output, workers=args.workers, chunksize=args.chunksize,
+              mode=args.mode, timeLimit=args.time_limit, nodeLimit=args.node_limit)
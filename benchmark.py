@@ -0,0 +1,336 @@
+import argparse
+import json
+import os
+import platform
+import random
+import time
+import tracemalloc
+from generator import generatePuzzles
+from graph import Graph, CSRGraph
+from puzzleio import boardFromLine, boardToLine, readLines
+from solver import SudokuSolver
+from sudokuconnections import SudokuConnections
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+# Known hard 9x9 boards : AI Escargot, Inkala 2012 and a board built to defeat
+# brute force search in id order (its first row is blank and the solution
+# starts 987654321).
+PATHOLOGICAL_9X9 = (
+    "1....7.9..3..2...8..96..5....53..9...1..8...26....4...3......1..4......7..7...3..",
+    "8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..",
+    "..............3.85..1.2.......5.7.....4...1...9.......5......73..2.1........4...9",
+)
+
+# (mode, ordering[, other solve options]) measured by the suite, the first one is the original search
+ENGINES = (("scan", "static"), ("bitmask", "static"), ("bitmask", "mrv"),
+           ("bitmask", "mrv", {"valueOrder": "lcv"}),
+           ("propagate", "mrv"), ("propagate", "mrv", {"valueOrder": "lcv"}), ("backjump", "mrv"), ("dlx", "mrv"))
+
+# the searches without inference explode on the hard boards, they only run on these
+SLOW_ENGINES = (("scan", "static"), ("bitmask", "static"), ("bitmask", "mrv"))
+SLOW_ENGINE_CORPORA = ("9x9-easy", "9x9-hard", "16x16-easy")
+
+
+def fixedPuzzles(count=10, boxSize=4, blanks=0.3, seed=0):
+    """
+    Returns count reproducible puzzles.
+    A solved grid is built from the usual shifted pattern, shuffled with the
+    sudoku symmetries (digits, rows in a band, bands, columns in a stack, stacks)
+    and then blanks fraction of the cells are set to 0.
+    """
+    rnd = random.Random(seed)
+    size = boxSize * boxSize
+    puzzles = []
+    for _ in range(count):
+        digits = list(range(1, size + 1))
+        rnd.shuffle(digits)
+        rows = [band * boxSize + r
+                for band in rnd.sample(range(boxSize), boxSize)
+                for r in rnd.sample(range(boxSize), boxSize)]
+        cols = [stack * boxSize + c
+                for stack in rnd.sample(range(boxSize), boxSize)
+                for c in rnd.sample(range(boxSize), boxSize)]
+        board = [[digits[(boxSize * (r % boxSize) + r // boxSize + c) % size]
+                  for c in cols] for r in rows]
+        for row in range(size):
+            for col in range(size):
+                if rnd.random() < blanks:
+                    board[row][col] = 0
+        puzzles.append(board)
+    return puzzles
+
+
+def benchModes(puzzles, configs=(("scan", "static"), ("bitmask", "static"),
+                                  ("bitmask", "mrv"), ("bitmask", "dsatur"),
+                                  ("propagate", "mrv"), ("dlx", "mrv"))):
+    """ solves every puzzle with every (mode, ordering) pair and prints the timings """
+    solver = SudokuSolver()
+    for mode, ordering in configs:
+        times = []
+        nodes = 0
+        for board in puzzles:
+            start = time.perf_counter()
+            color, stats = solver.solveGraphColoring(board, mode=mode, ordering=ordering)
+            times.append(time.perf_counter() - start)
+            nodes += stats.nodes
+            if color is None:
+                print(mode, ordering, ": no solution found for a benchmark puzzle")
+        times.sort()
+        print("%-9s %-7s total %.4fs  median %.6fs  max %.6fs  nodes %d" % (
+            mode, ordering, sum(times), times[len(times) // 2], times[-1], nodes))
+
+
+def benchGraphs(boxSizes=(4, 6), rounds=20):
+    """
+    Compares the dict based Graph and the CSRGraph : memory held by the
+    built and frozen graph, and neighbour ids iterated per second.
+    """
+    for boxSize in boxSizes:
+        for graphType in (Graph, CSRGraph):
+            tracemalloc.start()
+            connections = SudokuConnections(boxSize, graphType)
+            connections.graph.freeze()
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            graph = connections.graph
+            ids = list(graph.getAllNodesIds())
+            seen = 0
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for v in ids:
+                    for u in graph.getNode(v).getConnections():
+                        seen += 1
+            elapsed = time.perf_counter() - start
+            print("%dx%d %-8s memory %8.1f KiB  neighbours/s %.2e" % (
+                boxSize * boxSize, boxSize * boxSize, graphType.__name__,
+                memory / 1024.0, seen / elapsed))
+
+
+def benchRecursion(puzzles, configs=(("bitmask", "static"), ("bitmask", "mrv"), ("propagate", "mrv"))):
+    """ prints the time per search node of the recursive and the iterative searches """
+    solver = SudokuSolver()
+    for mode, ordering in configs:
+        for iterative in (False, True):
+            nodes = 0
+            elapsed = 0.0
+            for board in puzzles:
+                color, stats = solver.solveGraphColoring(board, mode=mode, ordering=ordering,
+                                                         iterative=iterative)
+                nodes += stats.nodes
+                elapsed += stats.elapsed
+            print("%-9s %-7s %-9s nodes %8d  %.2f us/node" % (
+                mode, ordering, "iterative" if iterative else "recursive",
+                nodes, 1e6 * elapsed / max(nodes, 1)))
+
+
+def corpusSpecs():
+    """
+    Returns {corpus name : function making its puzzles}. Everything is seeded
+    so makeCorpus always writes the same files.
+    """
+    def generated(count, boxSize, seed, minClues, difficulty=None):
+        return lambda: [puzzle for puzzle, solution, grade, score in
+                        generatePuzzles(count, boxSize, seed, difficulty, minClues, workers=1)]
+    return {
+        "9x9-easy": generated(20, 3, 100, 36),
+        "9x9-hard": generated(20, 3, 200, 0),
+        "9x9-pathological": lambda: [boardFromLine(line) for line in PATHOLOGICAL_9X9],
+        "16x16-easy": generated(20, 4, 300, 160),
+        # minimal puzzles the search has to backtrack on
+        "16x16-hard": generated(10, 4, 400, 0, "expert"),
+        # random blanks without a uniqueness check, several solutions and a heavy tail
+        "16x16-pathological": lambda: fixedPuzzles(3, 4, blanks=0.55, seed=1),
+        "25x25-easy": generated(5, 5, 500, 450),
+        "25x25-hard": lambda: fixedPuzzles(3, 5, blanks=0.5, seed=2),
+    }
+
+
+def makeCorpus(directory=CORPUS_DIR):
+    """ (re)writes the corpus files, one puzzle per line """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for name, make in sorted(corpusSpecs().items()):
+        with open(os.path.join(directory, name + ".txt"), "w") as f:
+            for board in make():
+                f.write(boardToLine(board) + "\n")
+
+
+def loadCorpus(directory=CORPUS_DIR):
+    """ returns {corpus name : list of boards} read from the corpus files """
+    corpus = dict()
+    for fileName in sorted(os.listdir(directory)):
+        if fileName.endswith(".txt"):
+            path = os.path.join(directory, fileName)
+            corpus[fileName[:-4]] = [boardFromLine(line) for line in readLines(path)]
+    return corpus
+
+
+def percentile(values, q):
+    """ nearest rank percentile of a list of numbers, q in 0..100 """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(times):
+    """ latency summary (seconds) and throughput (per second) of a list of timings """
+    total = sum(times)
+    return {
+        "count": len(times),
+        "median": percentile(times, 50),
+        "p95": percentile(times, 95),
+        "p99": percentile(times, 99),
+        "max": max(times) if times else None,
+        "throughput": len(times) / total if total else None,
+    }
+
+
+def benchConstruction(boxSizes=(3, 4, 5), repeat=5):
+    """ times building SudokuConnections (not the shared cached one) per box size """
+    results = dict()
+    for boxSize in boxSizes:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            SudokuConnections(boxSize)
+            times.append(time.perf_counter() - start)
+        results["%dx%d" % (boxSize * boxSize, boxSize * boxSize)] = summarize(times)
+    return results
+
+
+def benchSafetyCheck(boxSize=4, repeat=2000):
+    """
+    Times one "is colour c safe for vertex v" check, the way the original
+    __isSafe2Color does it (isNeighbour against every vertex) and with the
+    row / column / block bitmasks of the bitmask mode.
+    """
+    solver = SudokuSolver(boxSize=boxSize)
+    graph = solver.sudokuGraph.graph
+    board = fixedPuzzles(1, boxSize, blanks=0.5, seed=7)[0]
+    color, given = solver.graphColoringInitializeColor(board)
+    rowUsed = [0] * solver.rows
+    colUsed = [0] * solver.rows
+    boxUsed = [0] * solver.rows
+    for v in given:
+        bit = 1 << (color[v] - 1)
+        rowUsed[solver.rowOf[v]] |= bit
+        colUsed[solver.colOf[v]] |= bit
+        boxUsed[solver.boxOf[v]] |= bit
+    blanks = [v for v in range(1, solver.totalV + 1) if v not in given]
+    v = blanks[len(blanks) // 2]
+    c = 1
+
+    def scan():
+        for i in range(1, solver.totalV + 1):
+            if color[i] == c and graph.isNeighbour(v, i):
+                return False
+        return True
+
+    def mask():
+        return not (rowUsed[solver.rowOf[v]] | colUsed[solver.colOf[v]] |
+                    boxUsed[solver.boxOf[v]]) & (1 << (c - 1))
+
+    results = dict()
+    for name, check in (("scan", scan), ("bitmask", mask)):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            check()
+            times.append(time.perf_counter() - start)
+        results[name] = summarize(times)
+    return results
+
+
+def benchSolves(corpus, engines=ENGINES, repeat=1, timeLimit=None):
+    """
+    Solves every board of every corpus with every engine.
+    timeLimit : optional seconds per solve, the boards that run out are
+                counted as exhausted and their time stays in the latencies
+    Returns a list of result records, one per (corpus, engine).
+    """
+    results = []
+    for name, boards in sorted(corpus.items()):
+        solver = SudokuSolver(boxSize=int(round(len(boards[0]) ** 0.5)))
+        for engine in engines:
+            mode, ordering = engine[:2]
+            options = engine[2] if len(engine) > 2 else {}
+            if (mode, ordering) in SLOW_ENGINES and name not in SLOW_ENGINE_CORPORA:
+                continue
+            times = []
+            nodes = []
+            valueChecks = 0
+            unsolved = 0
+            exhausted = 0
+            for _ in range(repeat):
+                for board in boards:
+                    color, stats = solver.solveGraphColoring(board, mode=mode, ordering=ordering,
+                                                             timeLimit=timeLimit, **options)
+                    times.append(stats.elapsed)
+                    nodes.append(stats.nodes)
+                    valueChecks += stats.valueChecks
+                    exhausted += stats.exhausted is not None
+                    unsolved += color is None and stats.exhausted is None
+            record = {"corpus": name, "mode": mode, "ordering": ordering, "options": options,
+                      "medianNodes": percentile(nodes, 50), "maxNodes": max(nodes),
+                      "valueChecks": valueChecks,
+                      "unsolved": unsolved, "exhausted": exhausted}
+            record.update(summarize(times))
+            results.append(record)
+    return results
+
+
+def runSuite(corpusDir=CORPUS_DIR, only=None, repeat=1, timeLimit=None):
+    """
+    Runs the whole benchmark and returns a JSON serializable report.
+    only : optional list of corpus names to restrict the solve benchmark
+    """
+    corpus = loadCorpus(corpusDir)
+    if only:
+        corpus = dict((name, boards) for name, boards in corpus.items() if name in only)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "construction": benchConstruction(),
+        "safetyCheck": benchSafetyCheck(),
+        "solves": benchSolves(corpus, repeat=repeat, timeLimit=timeLimit),
+    }
+
+
+def legacyReport():
+    """ the earlier printed comparisons of graph backends, search variants and modes """
+    benchGraphs()
+    print("recursive against iterative search, 16x16 (45% blanks)")
+    benchRecursion(fixedPuzzles(4, blanks=0.45, seed=3))
+    print("easy 16x16 (30% blanks)")
+    benchModes(fixedPuzzles(10))
+    print("hard 16x16 (50% blanks)")
+    benchModes(fixedPuzzles(10, blanks=0.5, seed=1),
+               configs=(("bitmask", "static"), ("bitmask", "mrv"), ("bitmask", "dsatur"),
+                        ("propagate", "mrv"), ("dlx", "mrv")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solver benchmark suite, prints a JSON report.")
+    parser.add_argument("--out", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--corpus", nargs="*", help="only run these corpora (e.g. 16x16-hard)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--time-limit", type=float, help="seconds allowed per solve")
+    parser.add_argument("--make-corpus", action="store_true", help="regenerate the corpus files")
+    parser.add_argument("--legacy", action="store_true", help="print the older comparisons")
+    args = parser.parse_args()
+    if args.make_corpus:
+        makeCorpus()
+    elif args.legacy:
+        legacyReport()
+    else:
+        report = json.dumps(runSuite(only=args.corpus, repeat=args.repeat,
+                                     timeLimit=args.time_limit), indent=2)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(report + "\n")
+        else:
+            print(report)
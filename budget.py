@@ -0,0 +1,92 @@
+import threading
+from time import perf_counter
+
+'''
+Limits for a single solve. The searches count nodes anyway, so a budget
+only costs them one integer comparison per node : the clock, the node limit
+and the cancel token are looked at every checkEvery nodes, when the node
+count reaches nextCheck. Running out raises BudgetExhausted, which the
+solver catches and reports in SolveStats.exhausted.
+'''
+
+EXHAUSTED_NODES = "nodes"
+EXHAUSTED_TIME = "time"
+EXHAUSTED_CANCELLED = "cancelled"
+
+
+class BudgetExhausted(Exception):
+
+    def __init__(self, reason):
+        """ reason : one of EXHAUSTED_NODES, EXHAUSTED_TIME, EXHAUSTED_CANCELLED """
+        Exception.__init__(self, "Solve budget exhausted : " + reason)
+        self.reason = reason
+
+
+class CancelToken:
+
+    def __init__(self, event=None):
+        """
+        Flag another thread sets to stop a running solve. One token may be
+        shared by several solves, all of them stop at their next check.
+        event : the flag, a new threading.Event by default. A multiprocessing
+                Event lets the solves of worker processes share the token.
+        """
+        self.__event = threading.Event() if event is None else event
+
+    def cancel(self):
+        self.__event.set()
+
+    def isCancelled(self):
+        return self.__event.is_set()
+
+    def reset(self):
+        """ clears the flag so the token can be used for the next solve """
+        self.__event.clear()
+
+
+class Budget:
+
+    def __init__(self, timeLimit=None, nodeLimit=None, cancel=None, checkEvery=256):
+        """
+        timeLimit : seconds the solve may run, counted from start()
+        nodeLimit : most search nodes (colours tried) the solve may use
+        cancel : optional CancelToken
+        checkEvery : nodes between two looks at the clock and the token
+        None for every limit gives a budget that never runs out and is
+        never checked.
+        """
+        self.timeLimit = timeLimit
+        self.nodeLimit = nodeLimit
+        self.cancel = cancel
+        self.checkEvery = checkEvery
+        self.deadline = None
+        self.nextCheck = float("inf")
+
+    def start(self):
+        """ starts the clock, called once when the solve begins """
+        if self.timeLimit is not None:
+            self.deadline = perf_counter() + self.timeLimit
+        self.nextCheck = float("inf")
+        if self.timeLimit is not None or self.cancel is not None:
+            self.nextCheck = self.checkEvery
+        if self.nodeLimit is not None:
+            self.nextCheck = min(self.nextCheck, self.nodeLimit + 1)
+        return self
+
+    def check(self, nodes):
+        """
+        Called by the searches when nodes reaches nextCheck.
+        Raises BudgetExhausted when a limit is hit, otherwise sets the next check.
+        """
+        if self.nodeLimit is not None and nodes > self.nodeLimit:
+            raise BudgetExhausted(EXHAUSTED_NODES)
+        if self.cancel is not None and self.cancel.isCancelled():
+            raise BudgetExhausted(EXHAUSTED_CANCELLED)
+        if self.deadline is not None and perf_counter() >= self.deadline:
+            raise BudgetExhausted(EXHAUSTED_TIME)
+        if self.timeLimit is not None or self.cancel is not None:
+            self.nextCheck = nodes + self.checkEvery
+        else:
+            self.nextCheck = float("inf")
+        if self.nodeLimit is not None:
+            self.nextCheck = min(self.nextCheck, self.nodeLimit + 1)
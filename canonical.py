@@ -0,0 +1,221 @@
+import os
+from collections import OrderedDict
+from itertools import islice, permutations, product
+from puzzleio import boardFromLine, boardToLine
+from solver import getSolver
+
+'''
+Canonical form of a puzzle under the sudoku symmetries : relabelling the
+digits, permuting the rows inside a band, the bands, the columns inside a
+stack, the stacks, and transposing. Isomorphic puzzles get the same
+canonical board, so a solution found for one of them is mapped to any other
+by a permutation instead of a search.
+
+Rows and columns are ordered by keys that do not change under any of these
+symmetries (clue counts, refined once by the counts of the crossing lines),
+bands and stacks by the keys of their lines. Lines with equal keys are tried
+in every order, up to maxCandidates arrangements, and the smallest board is
+kept. Digits are then numbered in order of first appearance. When more
+arrangements tie than maxCandidates allows, two isomorphic puzzles may still
+get different canonical boards : the cache then misses, it never answers wrong.
+'''
+
+
+class Transform:
+
+    def __init__(self, transposed, rowOrder, colOrder, digitMap):
+        """
+        canonical[i][j] = digitMap[grid[rowOrder[i]][colOrder[j]]] where grid is
+        the board, transposed first when transposed is True. digitMap is a
+        permutation list of 0..N with digitMap[0] == 0.
+        """
+        self.transposed = transposed
+        self.rowOrder = rowOrder
+        self.colOrder = colOrder
+        self.digitMap = digitMap
+
+    def apply(self, board):
+        """ maps a board of the original frame into the canonical frame """
+        grid = [list(row) for row in zip(*board)] if self.transposed else board
+        digitMap = self.digitMap
+        return [[digitMap[grid[r][c]] for c in self.colOrder] for r in self.rowOrder]
+
+    def invert(self, board):
+        """ maps a board of the canonical frame back into the original frame """
+        size = len(board)
+        inverse = [0] * len(self.digitMap)
+        for digit, label in enumerate(self.digitMap):
+            inverse[label] = digit
+        grid = [[0] * size for _ in range(size)]
+        for i, r in enumerate(self.rowOrder):
+            for j, c in enumerate(self.colOrder):
+                grid[r][c] = inverse[board[i][j]]
+        return [list(row) for row in zip(*grid)] if self.transposed else grid
+
+
+def _lineKeys(grid, size):
+    """ symmetry invariant keys of the rows and of the columns of the grid """
+    rowCount = [sum(1 for value in row if value) for row in grid]
+    colCount = [sum(1 for row in grid if row[col]) for col in range(size)]
+    rowKeys = [(rowCount[r], tuple(sorted(colCount[c] for c in range(size) if grid[r][c])))
+               for r in range(size)]
+    colKeys = [(colCount[c], tuple(sorted(rowCount[r] for r in range(size) if grid[r][c])))
+               for c in range(size)]
+    return rowKeys, colKeys
+
+
+def _tieOrders(items, key):
+    """ yields every order of items sorted by key, equal keys in every order """
+    ordered = sorted(items, key=key)
+    groups = []
+    for item in ordered:
+        if groups and key(groups[-1][0]) == key(item):
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+    for choice in product(*[permutations(group) for group in groups]):
+        yield [item for group in choice for item in group]
+
+
+def _lineOrders(keys, boxSize, limit):
+    """ up to limit orders of the lines, bands (or stacks) first then the lines inside them """
+    bandKeys = [tuple(sorted(keys[band * boxSize:(band + 1) * boxSize])) for band in range(boxSize)]
+    inside = [list(islice(_tieOrders(range(band * boxSize, (band + 1) * boxSize),
+                                     lambda line: keys[line]), limit))
+              for band in range(boxSize)]
+    orders = []
+    for bandOrder in _tieOrders(range(boxSize), lambda band: bandKeys[band]):
+        for lines in product(*[inside[band] for band in bandOrder]):
+            orders.append([line for group in lines for line in group])
+            if len(orders) >= limit:
+                return orders
+    return orders
+
+
+def _relabel(grid, rowOrder, colOrder, size):
+    """ digits numbered by first appearance, returns (cells as a tuple, digitMap) """
+    digitMap = [0] * (size + 1)
+    nextLabel = 1
+    cells = []
+    for r in rowOrder:
+        row = grid[r]
+        for c in colOrder:
+            value = row[c]
+            if value and not digitMap[value]:
+                digitMap[value] = nextLabel
+                nextLabel += 1
+            cells.append(digitMap[value])
+    # digits missing from the puzzle take the labels left, in order
+    for digit in range(1, size + 1):
+        if not digitMap[digit]:
+            digitMap[digit] = nextLabel
+            nextLabel += 1
+    return tuple(cells), digitMap
+
+
+def canonicalForm(board, maxCandidates=8):
+    """
+    Returns (canonical, transform) : the canonical board of the puzzle and the
+    Transform mapping it there, transform.invert(canonical) gives back the board.
+    maxCandidates : most arrangements of tied lines tried per orientation
+    """
+    size = len(board)
+    boxSize = int(round(size ** 0.5))
+    best = None
+    for transposed in (False, True):
+        grid = [list(row) for row in zip(*board)] if transposed else board
+        rowKeys, colKeys = _lineKeys(grid, size)
+        rowOrders = _lineOrders(rowKeys, boxSize, maxCandidates)
+        colOrders = _lineOrders(colKeys, boxSize, maxCandidates)
+        for rowOrder, colOrder in islice(product(rowOrders, colOrders), maxCandidates):
+            cells, digitMap = _relabel(grid, rowOrder, colOrder, size)
+            if best is None or cells < best[0]:
+                best = (cells, Transform(transposed, rowOrder, colOrder, digitMap))
+    cells, transform = best
+    return [list(cells[row * size:(row + 1) * size]) for row in range(size)], transform
+
+
+class SolutionCache:
+
+    def __init__(self, maxSize=10000, path=None):
+        """
+        Bounded LRU from canonical puzzles to their solution (or to None for
+        a puzzle without one).
+        maxSize : most puzzles kept, the least recently used is dropped first
+        path : optional file the cache is loaded from and saved to, one
+               "puzzle solution" pair of puzzle lines per line
+        """
+        self.maxSize = maxSize
+        self.path = path
+        self.entries = OrderedDict()  # canonical puzzle line : canonical solution line or None
+        self.hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, board):
+        """
+        Returns (found, solution) : found tells whether the puzzle or an
+        isomorphic one is in the cache, solution is then its solution in the
+        frame of board (None when it has none).
+        """
+        canonical, transform = canonicalForm(board)
+        key = boardToLine(canonical)
+        if key not in self.entries:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        solution = self.entries[key]
+        if solution is None:
+            return True, None
+        return True, transform.invert(boardFromLine(solution))
+
+    def put(self, board, solution):
+        """ stores the solution of board (None : the puzzle has no solution) """
+        canonical, transform = canonicalForm(board)
+        key = boardToLine(canonical)
+        self.entries[key] = None if solution is None else boardToLine(transform.apply(solution))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def solve(self, board, **options):
+        """
+        Answers from the cache when it can, otherwise solves the board with
+        SudokuSolver.solveGraphColoring(board, **options) and stores the result.
+        A solve stopped by its budget is not stored.
+        Returns (solution, hit) with solution None when the board has no solution.
+        """
+        found, solution = self.get(board)
+        if found:
+            return solution, True
+        solver = getSolver(int(round(len(board) ** 0.5)))
+        color, stats = solver.solveGraphColoring(board, **options)
+        solution = None if color is None else solver.colorToBoard(color)
+        if stats.exhausted is None:
+            self.put(board, solution)
+        return solution, False
+
+    def load(self, path):
+        """ adds the pairs saved in path, the later lines being the most recent """
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) == 2:
+                    self.entries[fields[0]] = None if fields[1] == "-" else fields[1]
+                    self.entries.move_to_end(fields[0])
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def save(self, path=None):
+        """ writes the cache to path (default : the path given at creation), least recent first """
+        path = path or self.path
+        temp = path + ".tmp"
+        with open(temp, "w") as f:
+            for key, solution in self.entries.items():
+                f.write("%s %s\n" % (key, "-" if solution is None else solution))
+        os.replace(temp, path)
@@ -0,0 +1,237 @@
+from budget import BudgetExhausted
+
+
+class DancingLinks:
+
+    def __init__(self, boxSize=4):
+        """
+        Exact cover matrix of a (boxSize^2 x boxSize^2) sudoku stored as
+        dancing links in flat lists (Knuth's Algorithm X).
+
+        One matrix row per (cell, digit) candidate, row id = cell * size + digit
+        with digit counted from 0. Four column groups : every cell holds one
+        digit, every row / column / block holds every digit once.
+
+        The links are restored after every search, so the same object is
+        reused for all the puzzles of a size (see getExactCover). It is not
+        safe to search the same object from two threads at once.
+        """
+        self.boxSize = boxSize
+        self.size = size = boxSize * boxSize
+        cells = size * size
+        self.columns = columns = 4 * cells
+
+        # node 0 is the root, nodes 1..columns are the column headers
+        self.L = [i - 1 for i in range(columns + 1)]
+        self.R = [i + 1 for i in range(columns + 1)]
+        self.L[0] = columns
+        self.R[columns] = 0
+        self.U = list(range(columns + 1))
+        self.D = list(range(columns + 1))
+        self.C = list(range(columns + 1))
+        self.S = [0] * (columns + 1)
+        self.rowOf = [-1] * (columns + 1)
+        self.rowNode = [0] * (cells * size)  # first node of every matrix row
+
+        for row in range(size):
+            for col in range(size):
+                box = (row // boxSize) * boxSize + col // boxSize
+                cell = row * size + col
+                for digit in range(size):
+                    self.__addRow(cell * size + digit, (
+                        1 + cell,
+                        1 + cells + row * size + digit,
+                        1 + 2 * cells + col * size + digit,
+                        1 + 3 * cells + box * size + digit))
+
+    def __addRow(self, rowId, cols):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        first = len(L)
+        for k, col in enumerate(cols):
+            node = first + k
+            L.append(first + (k - 1) % len(cols))
+            R.append(first + (k + 1) % len(cols))
+            U.append(U[col])
+            D.append(col)
+            D[U[col]] = node
+            U[col] = node
+            C.append(col)
+            S[col] += 1
+            self.rowOf.append(rowId)
+        self.rowNode[rowId] = first
+
+    def __cover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def __uncover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+
+    def __select(self, node):
+        """ covers the other columns of the row of node """
+        j = self.R[node]
+        while j != node:
+            self.__cover(self.C[j])
+            j = self.R[j]
+
+    def __deselect(self, node):
+        j = self.L[node]
+        while j != node:
+            self.__uncover(self.C[j])
+            j = self.L[j]
+
+    def search(self, givenRows, limit=1, stats=None):
+        """
+        Runs Algorithm X with the given matrix rows already chosen.
+        limit : stop after this many solutions (None counts them all)
+        stats : optional SolveStats, nodes, backtracks and maxDepth are added to it,
+                and its budget is checked as the search goes. When the budget runs
+                out the links are restored and BudgetExhausted is raised with the
+                number of solutions seen so far in its count attribute.
+                Its onAssign / onBacktrack hooks are called for every row chosen /
+                dropped by the search, as (cell + 1, digit + 1, depth) : the vertex
+                and colour of the SudokuSolver numbering.
+
+        Returns (rows, count) where rows are the row ids of the first solution
+        found (None when there is none) and count the number of solutions seen.
+        """
+        L, R, D, C, S = self.L, self.R, self.D, self.C, self.S
+        covered = []
+        usedColumns = set()
+        first = None
+        count = 0
+        nodes = backtracks = maxDepth = 0
+        budget = stats.budget if stats is not None else None
+        nextCheck = budget.nextCheck if budget is not None else float("inf")
+        onAssign = stats.onAssign if stats is not None else None
+        onBacktrack = stats.onBacktrack if stats is not None else None
+        size = self.size
+        rowOf = self.rowOf
+        stack = []
+        try:
+            # place the givens, a column hit twice means the clues clash
+            for rowId in givenRows:
+                node = self.rowNode[rowId]
+                cols = [C[node]]
+                j = R[node]
+                while j != node:
+                    cols.append(C[j])
+                    j = R[j]
+                if usedColumns.intersection(cols):
+                    return None, 0
+                usedColumns.update(cols)
+                for col in cols:
+                    self.__cover(col)
+                    covered.append(col)
+
+            while True:
+                if R[0] == 0:
+                    count += 1
+                    if first is None:
+                        first = list(givenRows) + [self.rowOf[n] for n in stack]
+                    if limit is not None and count >= limit:
+                        break
+                    advance = False
+                else:
+                    # column with the fewest rows left
+                    c = R[0]
+                    best = c
+                    while c != 0:
+                        if S[c] < S[best]:
+                            best = c
+                            if S[c] <= 1:
+                                break
+                        c = R[c]
+                    advance = S[best] > 0
+                    if advance:
+                        self.__cover(best)
+                        node = D[best]
+                        stack.append(node)
+                        self.__select(node)
+                        nodes += 1
+                        if nodes >= nextCheck:
+                            nextCheck = self.__checkBudget(budget, nodes, count)
+                        if onAssign is not None:
+                            onAssign(rowOf[node] // size + 1, rowOf[node] % size + 1, len(stack))
+                        if len(stack) > maxDepth:
+                            maxDepth = len(stack)
+                if advance:
+                    continue
+
+                # backtrack to the last column that still has a row to try
+                while stack:
+                    if onBacktrack is not None:
+                        onBacktrack(rowOf[stack[-1]] // size + 1, rowOf[stack[-1]] % size + 1,
+                                    len(stack))
+                    node = stack.pop()
+                    self.__deselect(node)
+                    backtracks += 1
+                    col = C[node]
+                    node = D[node]
+                    if node != col:
+                        stack.append(node)
+                        self.__select(node)
+                        nodes += 1
+                        if nodes >= nextCheck:
+                            nextCheck = self.__checkBudget(budget, nodes, count)
+                        if onAssign is not None:
+                            onAssign(rowOf[node] // size + 1, rowOf[node] % size + 1, len(stack))
+                        break
+                    self.__uncover(col)
+                else:
+                    break
+        finally:
+            # leave the links as they were before the search
+            while stack:
+                node = stack.pop()
+                self.__deselect(node)
+                self.__uncover(C[node])
+            for col in reversed(covered):
+                self.__uncover(col)
+            if stats is not None:
+                stats.nodes += nodes
+                stats.visited += nodes
+                stats.backtracks += backtracks
+                stats.maxDepth = max(stats.maxDepth, maxDepth)
+        return first, count
+
+    def __checkBudget(self, budget, nodes, count):
+        """ checks the budget, returns the node count of the next check """
+        try:
+            budget.check(nodes)
+        except BudgetExhausted as e:
+            e.count = count
+            raise
+        return budget.nextCheck
+
+
+_exactCovers = dict()  # boxSize : DancingLinks
+
+
+def getExactCover(boxSize):
+    """ returns the exact cover matrix of the size, building it on first use """
+    matrix = _exactCovers.get(boxSize)
+    if matrix is None:
+        matrix = _exactCovers[boxSize] = DancingLinks(boxSize)
+    return matrix
@@ -1,6 +1,13 @@
 
+from array import array
+from bisect import bisect_left
+from types import MappingProxyType
+
+
 class Node:
 
+    __slots__ = ("id", "data", "connectedTo")
+
     def __init__(self, idx, data=0):  # Constructor
         '''
         __init__(self, idx, data=0): Constructor method that initializes the id and data attributes of a node.
@@ -67,27 +74,45 @@ class Node:
 
 class Graph:
 
-    totalV = 0  # total vertices in the graph
-
     def __init__(self):
         """
         allNodes = Dictionary (key:value)
                    idx : Node Object
+        totalV = total vertices in this graph
         """
         self.allNodes = dict()
+        self.totalV = 0
+        self.frozen = False
+
+    def freeze(self):
+        """
+        Makes the graph read only so that it can be shared between solvers.
+        The adjacency of every node becomes a read only mapping and the
+        methods that change the graph raise a RuntimeError.
+        """
+        for node in self.allNodes.values():
+            node.connectedTo = MappingProxyType(node.connectedTo)
+        self.frozen = True
+        return self
+
+    def __checkNotFrozen(self):
+        if self.frozen:
+            raise RuntimeError("The graph is frozen and can not be modified")
 
     def addNode(self, idx):
         """ adds the node """
+        self.__checkNotFrozen()
         if idx in self.allNodes:
             return None
 
-        Graph.totalV += 1
+        self.totalV += 1
         node = Node(idx=idx)
         self.allNodes[idx] = node
         return node
 
     def addNodeData(self, idx, data):
         """ set node data acc to idx """
+        self.__checkNotFrozen()
         if idx in self.allNodes:
             node = self.allNodes[idx]
             node.setData(data)
@@ -102,14 +127,25 @@ class Graph:
         dst = node_id = edge ends at
         To make it a directed graph comment the second line
         """
+        self.__checkNotFrozen()
         self.allNodes[src].addNeighbour(self.allNodes[dst], wt)
         self.allNodes[dst].addNeighbour(self.allNodes[src], wt)
 
+    def setNeighbours(self, idx, ids, wt=0):
+        """
+        Sets the whole adjacency of node idx at once.
+        ids = ids of all its neighbours
+        Used when the adjacency is precomputed, the caller is responsible
+        for also listing idx among the neighbours of each id.
+        """
+        self.__checkNotFrozen()
+        self.allNodes[idx].connectedTo = dict.fromkeys(ids, wt)
+
     def isNeighbour(self, u, v):
         """
         check neighbour exists or not
         """
-        if u >= 1 and u <= 256 and v >= 1 and v <= 256 and u != v:
+        if u != v and u in self.allNodes and v in self.allNodes:
             if v in self.allNodes[u].getConnections():
                 return True
         return False
@@ -132,4 +168,127 @@ class Graph:
         return self.allNodes.keys()
 
 
+class CSRNode:
+
+    __slots__ = ("graph", "id")
 
+    def __init__(self, graph, idx):
+        """
+        Light view of one vertex of a CSRGraph, created on demand by getNode.
+        It offers the read methods of Node, the data lives in the graph.
+        """
+        self.graph = graph
+        self.id = idx
+
+    def getConnections(self):
+        return self.graph.getConnections(self.id)
+
+    def getID(self):
+        return self.id
+
+    def getData(self):
+        return self.graph.data[self.id]
+
+    def setData(self, data):
+        self.graph.addNodeData(self.id, data)
+
+
+class CSRGraph:
+
+    def __init__(self):
+        """
+        Compact graph with the same API as Graph for nodes numbered 1 to totalV.
+        While it is being built the edges are kept in per node sets. freeze()
+        packs them into two flat arrays (compressed sparse rows) :
+        the neighbours of v are adjacency[offsets[v]:offsets[v+1]], sorted.
+        """
+        self.totalV = 0
+        self.frozen = False
+        self.data = dict()
+        self.pending = dict()  # idx : set of neighbour ids, until freeze
+        self.offsets = None
+        self.adjacency = None
+
+    def freeze(self):
+        """ packs the adjacency into the flat arrays and makes the graph read only """
+        if self.frozen:
+            return self
+        code = "H" if self.totalV < (1 << 16) else "I"
+        offsets = array("I", [0] * (self.totalV + 2))
+        adjacency = array(code)
+        for idx in range(1, self.totalV + 1):
+            offsets[idx] = len(adjacency)
+            adjacency.extend(sorted(self.pending.get(idx, ())))
+        offsets[self.totalV + 1] = len(adjacency)
+        self.offsets = offsets
+        self.adjacency = adjacency
+        self.pending = None
+        self.frozen = True
+        return self
+
+    def __checkNotFrozen(self):
+        if self.frozen:
+            raise RuntimeError("The graph is frozen and can not be modified")
+
+    def addNode(self, idx):
+        """ adds the node, ids must be added as 1, 2, ..., totalV """
+        self.__checkNotFrozen()
+        if idx in self.pending:
+            return None
+        if idx != self.totalV + 1:
+            raise ValueError("CSRGraph nodes must be numbered 1 to totalV in order")
+        self.totalV += 1
+        self.pending[idx] = set()
+        self.data[idx] = 0
+        return CSRNode(self, idx)
+
+    def addNodeData(self, idx, data):
+        """ set node data acc to idx """
+        self.__checkNotFrozen()
+        if idx in self.data:
+            self.data[idx] = data
+        else:
+            print("No ID to add the data.")
+
+    def addEdge(self, src, dst, wt=0):
+        """ Adds an undirected edge, weights are not stored """
+        self.__checkNotFrozen()
+        self.pending[src].add(dst)
+        self.pending[dst].add(src)
+
+    def setNeighbours(self, idx, ids, wt=0):
+        """ Sets the whole adjacency of node idx at once, see Graph.setNeighbours """
+        self.__checkNotFrozen()
+        self.pending[idx] = set(ids)
+
+    def getConnections(self, idx):
+        """ returns the ids of the neighbours of idx """
+        if self.frozen:
+            return self.adjacency[self.offsets[idx]:self.offsets[idx + 1]]
+        return self.pending[idx]
+
+    def isNeighbour(self, u, v):
+        """
+        check neighbour exists or not
+        """
+        if u == v or not (1 <= u <= self.totalV and 1 <= v <= self.totalV):
+            return False
+        if not self.frozen:
+            return v in self.pending[u]
+        lo, hi = self.offsets[u], self.offsets[u + 1]
+        i = bisect_left(self.adjacency, v, lo, hi)
+        return i < hi and self.adjacency[i] == v
+
+    def printEdges(self):
+        """ print all edges """
+        for idx in range(1, self.totalV + 1):
+            for con in self.getConnections(idx):
+                print(idx, " --> ", con)
+
+    def getNode(self, idx):
+        if 1 <= idx <= self.totalV:
+            return CSRNode(self, idx)
+        return None
+
+    def getAllNodesIds(self):
+        return range(1, self.totalV + 1)
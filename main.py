@@ -1,6 +1,10 @@
+import threading
+import time
 import tkinter as tk
-from sudokuconnections import SudokuConnections
-from sudoku import Sudoku
+from budget import CancelToken
+from solver import SudokuSolver
+from puzzleio import DIGITS
+from generator import generatePuzzle
 
 
 class SudokuBoard:
@@ -16,10 +20,13 @@ class SudokuBoard:
         self.canvas.pack()  # Add the canvas widget to the main window
         # Call the getBoard() method to generate a new Sudoku board
         self.board = self.getBoard()
-        # Create a SudokuConnections object to represent the connections between cells
-        self.sudokuGraph = SudokuConnections()
-        # Call the __getMappedMatrix() method to map the Sudoku board to a 2D array of cells
-        self.mappedGrid = self.__getMappedMatrix()
+        # Create the headless solver, it owns the SudokuConnections graph
+        self.solver = SudokuSolver()
+        self.sudokuGraph = self.solver.sudokuGraph
+        # The solver maps each cell of the Sudoku board to the id of its vertex
+        self.mappedGrid = self.solver.mappedGrid
+        self.cellItems = None  # canvas text item id of every cell, made by the first printBoard
+        self.shown = None  # board currently drawn, so only changed cells are redrawn
         self.printBoard()  # Call the printBoard() method to draw the Sudoku board on the canvas
 
         # Add a label widget to display the output
@@ -35,85 +42,86 @@ class SudokuBoard:
             self.master, text="Clear", command=self.clearBoard)
         self.clear_button.pack()
 
-        self.flag = True  # A flag to indicate whether the puzzle has been solved or not
+        # Add a button widget to stop a running solve
+        self.cancel_button = tk.Button(
+            self.master, text="Cancel", command=self.cancelSolve, state=tk.DISABLED)
+        self.cancel_button.pack()
 
-    '''
-    This private method initializes and returns a matrix of size 16x16 with each element initialized to 0. 
-    It also assigns a unique value to each element in the matrix from 1 to 256 (16x16). 
-    This is used to map each cell of the Sudoku board to a unique value for graph coloring.
-    '''
+        self.flag = True  # A flag to indicate whether the puzzle has been solved or not
 
-    def __getMappedMatrix(self):
-        matrix = [[0 for cols in range(16)] for rows in range(16)]
-        count = 1
-        for rows in range(16):
-            for cols in range(16):
-                matrix[rows][cols] = count
-                count += 1
-        return matrix
+        # State shared with the solving thread. The thread never touches Tk, it
+        # only writes these and the event loop polls them with after().
+        self.worker = None
+        self.cancelToken = CancelToken()
+        self.live = None  # colour of every vertex as the search goes, index 0 unused
+        self.liveColours = 0  # colours put on cells so far, by the search or by propagation
+        self.result = None  # (color, stats) once the solve has ended
+        self.solveStart = 0.0
 
     '''
-    This method generates a new Sudoku board using the Sudoku class from the Sudokupy library. 
-    It sets the difficulty level to 0.3, which means that approximately 30% of the cells will be filled initially.
-    It then converts any None values to 0 to simplify the display process. Returns the generated board.
+    This method generates a new Sudoku board with the built in generator.
+    Clues are removed while the puzzle keeps a single solution, stopping at 180 clues
+    so that about 30% of the cells are blank. Blank cells are 0. Returns the generated board.
     '''
 
     def getBoard(self):
-        board1 = Sudoku(4).difficulty(0.3)
-        board = board1.board
+        board, solution, difficulty, score = generatePuzzle(4, minClues=180)
         # board[0][0]=1
         # board[0][1]=1
         #  (uncomment to obtain incorrect sudoku board)
-        
-        for row in range(16):
-            for col in range(16):
-                if board[row][col] == None:
-                    board[row][col] = 0
         return board
 
     def clearBoard(self):
+        if self.worker is not None:
+            return
         # Generate a new random Sudoku board with the same difficulty level as the current board
         self.board = self.getBoard()
 
-        # Delete all items in the canvas
-        self.canvas.delete("all")
-
-        # Update the canvas to display the new board
+        # Update the canvas to display the new board, the grid and cell items are kept
         self.printBoard()
+        self.output_label.config(text="")
 
-    def printBoard(self):
-        # Define a dictionary mapping integers to characters to be used for displaying the Sudoku board
-        character = {0: "0", 1: "1", 2: "2", 3: "3", 4: "4", 5: "5", 6: "6", 7: "7",
-                     8: "8", 9: "9", 10: "A", 11: "B", 12: "C", 13: "D", 14: "E", 15: "F", 16: "G"}
-
-        for i in range(len(self.board)):
+    def drawGrid(self):
+        """
+        Draws the grid lines and one empty text item per cell, once. Later
+        boards only change the text of these items.
+        """
+        size = len(self.board)
+        for i in range(0, size, 4):
             # Create lines to separate 4x4 grids horizontally and vertically
-            if i % 4 == 0:
-                self.canvas.create_line(
-                    (0, i * 25), (400, i * 25), width=2)  # horizontal
-                self.canvas.create_line(
-                    (i * 25, 0), (i * 25, 400), width=2)  # vertical
-
-            # Loop through each element in the row of the board matrix
-            for j in range(len(self.board[i])):
-                x = j * 25  # X-coordinate for the text to be displayed
-                y = i * 25  # Y-coordinate for the text to be displayed
-
-                # If the current cell of the board is not empty, display the corresponding character
-                if self.board[i][j] != 0:
-                    self.canvas.create_text(
-                        x + 12.5, y + 12.5, text=str(character[self.board[i][j]]))
-                # If the current cell of the board is empty, display a blank space
-                else:
-                    self.canvas.create_text(x + 12.5, y + 12.5, text=" ")
-                    self.canvas.create_line((0, 400), (400, 400), width=2)
-                    self.canvas.create_line((400, 0), (400, 400), width=2)
-                    self.canvas.create_line((0, 3), (400, 3), width=2)
-                    self.canvas.create_line((3, 0), (3, 400), width=2)
+            self.canvas.create_line((0, i * 25), (400, i * 25), width=2)  # horizontal
+            self.canvas.create_line((i * 25, 0), (i * 25, 400), width=2)  # vertical
+        self.canvas.create_line((0, 400), (400, 400), width=2)
+        self.canvas.create_line((400, 0), (400, 400), width=2)
+        self.canvas.create_line((0, 3), (400, 3), width=2)
+        self.canvas.create_line((3, 0), (3, 400), width=2)
         for i in range(1, 16):
             self.canvas.create_line((25*i, 0), (25*i, 400), width=1)
         for i in range(1, 16):
             self.canvas.create_line((0, 25*i), (400, 25*i), width=1)
+        self.cellItems = [[self.canvas.create_text(col * 25 + 12.5, row * 25 + 12.5, text=" ")
+                           for col in range(size)] for row in range(size)]
+        self.shown = [[0] * size for _ in range(size)]
+
+    def printBoard(self, board=None):
+        """
+        Shows the board (self.board by default) on the canvas. Only the cells
+        whose value differs from what is drawn are updated, so the number of
+        canvas items stays the same whatever the number of solves.
+        """
+        # Characters used for displaying the Sudoku board (0 to 9 then A to G), shared with the puzzle files
+        character = DIGITS
+        if board is None:
+            board = self.board
+        if self.cellItems is None:
+            self.drawGrid()
+        for i in range(len(board)):
+            for j in range(len(board[i])):
+                if board[i][j] != self.shown[i][j]:
+                    # a blank cell is displayed as a blank space
+                    text = str(character[board[i][j]]) if board[i][j] != 0 else " "
+                    self.canvas.itemconfig(self.cellItems[i][j], text=text)
+                    self.shown[i][j] = board[i][j]
 
     '''
     This method checks if the Sudoku board has any blank cells (denoted by 0)
@@ -160,91 +168,106 @@ class SudokuBoard:
 
         return True
 
-   
-
-    def graphColoringInitializeColor(self):
+    def solveGraphColoring(self, m=None):
         """
-        Initializes the colors for the graph based on the given board.
-
-        Returns:
-        - color (list): A list containing the colors for each vertex in the graph.
-         - given (list): A list containing the ids of vertices whose values are already given in the board.
+        Starts solving the board on a worker thread and returns at once.
+        The event loop polls the thread (see pollSolve) to show its progress
+        and the result, and the Cancel button stops it.
         """
-        color = [0] * (self.sudokuGraph.graph.totalV +
-                       1)  # Initialize color list with zeros
-        given = []  # Initialize list of already given values
+        if self.worker is not None:
+            return False
+        self.cancelToken.reset()
+        self.live = [0] * (self.solver.totalV + 1)
+        self.liveColours = 0
+        self.result = None
+        self.solveStart = time.perf_counter()
+        self.solve_button.config(state=tk.DISABLED)
+        self.clear_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.output_label.config(text="Solving...")
+        self.worker = threading.Thread(target=self.solveWorker, args=(self.board, m), daemon=True)
+        self.worker.start()
+        self.master.after(100, self.pollSolve)
+        return True
 
-        # Iterate through each cell in the board
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                if self.board[row][col] != 0:  # If the cell is not blank
-                    # Get the index of the corresponding vertex in the graph
-                    idx = self.mappedGrid[row][col]
-                    # Set the color of the vertex to the value of the cell
-                    color[idx] = self.board[row][col]
-                    # Add the vertex to the list of already given values
-                    given.append(idx)
-
-        return color, given  # Return the final color and given lists
-    
-    def solveGraphColoring(self, m=16):
-        color, given = self.graphColoringInitializeColor()
-        if self.__graphColorUtility(m=m, color=color, v=1, given=given) is None:
+    def solveWorker(self, board, m):
+        """
+        runs on the worker thread, it only writes the shared state. The hooks
+        also see the colours propagation forces, so live is the whole colouring
+        as it is now.
+        """
+        live = self.live
+
+        def onAssign(v, c, depth):
+            live[v] = c
+            self.liveColours += 1
+
+        def onBacktrack(v, c, depth):
+            live[v] = 0
+
+        try:
+            result = self.solver.solveGraphColoring(board, m=m, onAssign=onAssign,
+                                                    onBacktrack=onBacktrack, cancel=self.cancelToken)
+        except Exception as e:
+            # handed to showResult, the event loop must see the solve end either way
+            result = (None, e)
+        self.result = result
+
+    def cancelSolve(self):
+        self.cancelToken.cancel()
+
+    def pollSolve(self):
+        """ runs on the event loop every 100 ms while a solve is going on """
+        if self.result is None:
+            # show the search as it is now, the givens are never changed by the hooks
+            live = self.live[:]
+            board = [[self.board[row][col] or live[self.mappedGrid[row][col]]
+                      for col in range(len(self.board[row]))] for row in range(len(self.board))]
+            filled = sum(1 for row in board for value in row if value)
+            seconds = time.perf_counter() - self.solveStart
+            self.printBoard(board)
+            self.output_label.config(text="Solving... %d/%d cells, %d colours/s" % (
+                filled, self.solver.totalV, self.liveColours / seconds if seconds else 0))
+            self.master.after(100, self.pollSolve)
+            return
+        self.worker.join()
+        self.worker = None
+        self.solve_button.config(state=tk.NORMAL)
+        self.clear_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        self.showResult(*self.result)
+
+    def showResult(self, color, stats):
+        """ stats is the exception instead when the solve failed """
+        if isinstance(stats, Exception):
+            self.output_label.config(text="Solve failed : %s" % stats)
+            self.printBoard()
+            return False
+        if stats.conflicts:
+            self.output_label.config(text="Invalid board, clashing cells : " +
+                                     ", ".join(str(cell) for cell in stats.conflicts))
+            self.flag=True
+            self.printBoard()
+            return False
+        if stats.exhausted is not None:
+            self.output_label.config(text="Solve cancelled after %d nodes" % stats.nodes)
+            self.printBoard()
+            return False
+        if color is None:
             self.output_label.config(text="No solution found :(")
             self.flag=True
+            self.printBoard()
             return False
-        count = 1
-        for row in range(16):
-            for col in range(16):
-                self.board[row][col] = color[count]
-                count += 1
+        self.board = self.solver.colorToBoard(color)
         self.printBoard()
-        self.output_label.config(text="Solution found!")
+        self.output_label.config(text="Solution found! (%d nodes, %.3f s)" % (stats.nodes, stats.elapsed))
         return color
 
-    def __graphColorUtility(self, m, color, v, given):
-        # Base case: If all vertices are colored, return True
-        if v == self.sudokuGraph.graph.totalV + 1:
-            return True
-
-        # Try different colors for vertex v
-        for c in range(1, m+1):
-            # Check if it is safe to assign color c to vertex v
-            if self.__isSafe2Color(v, color, c, given) == True:
-                # Assign color c to vertex v
-
-                color[v] = c
-
-                if self.__graphColorUtility(m, color, v+1, given):
-                    # Recur to assign colors to the rest of the vertices
-                    return True
-            # Backtrack: if vertex v is not given, then reset the color to 0 and try another color
-            if v not in given:
-                color[v] = 0
-
-    '''
-    This function checks if it is safe to assign a given color c to vertex v in the graph coloring algorithm.
-    If the vertex has already been given a value, then it returns True only if the color c matches the given value.
-    If the vertex has not been given a value, then it returns False if any of its neighbours have already been colored with c.
-    Otherwise, it returns True, indicating that it is safe to color the vertex with c.
-    '''            
-
-    def __isSafe2Color(self, v, color, c, given):
-        if v in given and color[v] == c:
-            return True
-        elif v in given:
-            return False
-
-        for i in range(1, self.sudokuGraph.graph.totalV+1):
-            if color[i] == c and self.sudokuGraph.graph.isNeighbour(v, i):
-                return False
-        return True
-
-
-root = tk.Tk()
-board = SudokuBoard(root)
-# to be uncommented in case of invalid input
-# if board.solveGraphColoring() is None:
-#     board.output_label.config(text="No solution found :(")
-# else:      
-root.mainloop()
+if __name__ == "__main__":
+    root = tk.Tk()
+    board = SudokuBoard(root)
+    # to be uncommented in case of invalid input
+    # if board.solveGraphColoring() is None:
+    #     board.output_label.config(text="No solution found :(")
+    # else:
+    root.mainloop()
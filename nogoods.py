@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+
+class NogoodStore:
+
+    def __init__(self, maxSize=4096, maxLength=12):
+        """
+        Bounded store of partial colourings already shown to have no
+        extension, for the "backjump" search.
+        A nogood is a tuple of (vertex, colour) pairs. Only nogoods of at most
+        maxLength pairs are kept (longer ones seldom match again), and once
+        maxSize of them are stored the oldest one is dropped.
+        byPair indexes the nogoods by each of their pairs, so checking an
+        assignment only looks at the nogoods that contain it.
+        """
+        self.maxSize = maxSize
+        self.maxLength = maxLength
+        self.nogoods = OrderedDict()  # nogood tuple : None, oldest first
+        self.byPair = dict()  # (vertex, colour) : set of nogood tuples
+        self.hits = 0
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    def add(self, pairs):
+        """ stores the nogood made of pairs, returns False when it is too long to keep """
+        if len(pairs) > self.maxLength:
+            return False
+        nogood = tuple(sorted(pairs))
+        if nogood in self.nogoods:
+            return True
+        self.nogoods[nogood] = None
+        for pair in nogood:
+            self.byPair.setdefault(pair, set()).add(nogood)
+        if len(self.nogoods) > self.maxSize:
+            oldest, _ = self.nogoods.popitem(last=False)
+            for pair in oldest:
+                bucket = self.byPair[pair]
+                bucket.discard(oldest)
+                if not bucket:
+                    del self.byPair[pair]
+        return True
+
+    def check(self, v, c, color):
+        """
+        Called once colour c is put on v. Returns the vertices of a stored
+        nogood that the colouring now matches, or None.
+        """
+        bucket = self.byPair.get((v, c))
+        if not bucket:
+            return None
+        for nogood in bucket:
+            for u, cu in nogood:
+                if color[u] != cu:
+                    break
+            else:
+                self.hits += 1
+                return [u for u, cu in nogood]
+        return None
@@ -0,0 +1,81 @@
+
+class BucketQueue:
+
+    def __init__(self, maxKey):
+        """
+        Priority structure for the uncoloured vertices.
+        buckets[k] holds the vertices whose key (number of legal colours) is k,
+        so moving a vertex after an assignment is O(1) and the best vertex is
+        found by walking up from the smallest non empty bucket.
+        """
+        self.buckets = [set() for _ in range(maxKey + 1)]
+        self.keyOf = dict()
+
+    def __len__(self):
+        return len(self.keyOf)
+
+    def push(self, v, key):
+        """ adds vertex v with the given key """
+        self.keyOf[v] = key
+        self.buckets[key].add(v)
+
+    def remove(self, v):
+        """ removes vertex v, returns its key """
+        key = self.keyOf.pop(v)
+        self.buckets[key].discard(v)
+        return key
+
+    def move(self, v, key):
+        """ changes the key of a vertex already in the queue """
+        self.buckets[self.keyOf[v]].discard(v)
+        self.keyOf[v] = key
+        self.buckets[key].add(v)
+
+    def decrement(self, v):
+        self.move(v, self.keyOf[v] - 1)
+
+    def increment(self, v):
+        self.move(v, self.keyOf[v] + 1)
+
+    def peekBest(self, tieBreak=None):
+        """
+        Returns the vertex with the smallest key without removing it.
+        tieBreak : optional list indexed by vertex, the largest value wins a tie
+        Returns None when the queue is empty.
+        """
+        for bucket in self.buckets:
+            if bucket:
+                if tieBreak is None or len(bucket) == 1:
+                    return next(iter(bucket))
+                return max(bucket, key=tieBreak.__getitem__)
+        return None
+
+    def popBest(self, tieBreak=None):
+        """ same as peekBest but also removes the vertex from the queue """
+        v = self.peekBest(tieBreak)
+        if v is not None:
+            self.remove(v)
+        return v
+
+
+'''
+Vertex orderings understood by SudokuSolver.solveGraphColoring.
+"static" colours the vertices in id order like the original search.
+"mrv" picks the vertex with the fewest legal colours left (minimum remaining values).
+"dsatur" picks the vertex whose neighbours already use the most distinct colours.
+Both dynamic orderings break ties on the number of uncoloured neighbours. On a sudoku
+graph the saturation of a vertex is m minus its number of legal colours, so the two
+keys pick the same vertex; both names are kept as they are the usual terms.
+'''
+ORDERINGS = ("static", "mrv", "dsatur")
+
+'''
+Value orderings, the order in which the colours of the chosen vertex are tried.
+"numeric" tries them from 1 up like the original search.
+"lcv" (least constraining value) tries first the colour that the fewest uncoloured
+neighbours still have among their legal colours, so it takes away the fewest options.
+"random" tries them in a random order.
+With a seed, ties between lcv scores are broken at random and the random order is
+reproducible.
+'''
+VALUE_ORDERS = ("numeric", "lcv", "random")
@@ -0,0 +1,282 @@
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from budget import CancelToken, EXHAUSTED_CANCELLED, EXHAUSTED_TIME
+from ordering import ORDERINGS, VALUE_ORDERS
+from propagation import Propagator
+from puzzleio import boardFromLine, boardToLine, boxSizeOf
+from solver import SolveStats, getSolver
+from validator import findConflicts
+
+'''
+Parallel search of one hard board. Batch parallelism (batch.py) gives one
+board to each process, which does not help when a single board is the
+bottleneck. Here the top of the search tree is grown in this process
+instead : the most constrained vertex is branched on, breadth first, until
+there are enough subproblems for every worker to get several. Each
+subproblem is a board with the branch colours and everything propagation
+deduced written in, solved by a worker process with the usual engines.
+The children of a vertex split its colours, so the subproblems cover the
+search space without overlap : the first solution found stops the other
+workers through a shared cancel token, and solution counts simply add up.
+'''
+
+_workerOptions = dict()  # keyword arguments passed to solveGraphColoring / countSolutions
+_workerCancel = [None]  # CancelToken shared by the workers of one parallel solve
+COUNT_OPTIONS = ("m", "mode", "ordering", "nodeLimit", "valueOrder", "seed")  # what countSolutions takes
+
+
+def _initWorker(options, event):
+    """ runs once in every worker process : keeps the options and the shared cancel flag """
+    _workerOptions.clear()
+    _workerOptions.update(options)
+    _workerCancel[0] = None if event is None else CancelToken(event)
+
+
+def _remaining(deadline):
+    """ seconds left until deadline (a time.time() value), None without one """
+    return None if deadline is None else max(0.0, deadline - time.time())
+
+
+def _solvePart(board, deadline, options=None, cancel=None):
+    """
+    worker task : solves one subproblem, returns (solved board or None, stats dict).
+    options and cancel are the ones of the worker process when not given.
+    """
+    if options is None:
+        options, cancel = _workerOptions, _workerCancel[0]
+    solver = getSolver(boxSizeOf(len(board) ** 2))
+    color, stats = solver.solveGraphColoring(board, timeLimit=_remaining(deadline),
+                                             cancel=cancel, **options)
+    return (None if color is None else solver.colorToBoard(color)), stats.asDict()
+
+
+def _countPart(board, limit, deadline, options=None, cancel=None):
+    """ worker task : counts the solutions of one subproblem, returns (count, stats dict) """
+    if options is None:
+        options, cancel = _workerOptions, _workerCancel[0]
+    solver = getSolver(boxSizeOf(len(board) ** 2))
+    count, stats = solver.countSolutions(board, limit=limit, timeLimit=_remaining(deadline),
+                                         cancel=cancel, **options)
+    return count, stats.asDict()
+
+
+def splitBoard(solver, board, parts, m=None):
+    """
+    Grows the top of the search tree breadth first : a board is propagated,
+    then its most constrained vertex gets one child board per colour left,
+    until there are at least parts boards or nothing is left to branch on.
+    Returns (boards, solutions) : the open subproblems, and the boards that
+    propagation alone solved on the way.
+    """
+    if m is None:
+        m = solver.rows
+    frontier = deque([board])
+    solutions = []
+    while frontier and len(frontier) < parts:
+        current = frontier.popleft()
+        color, given = solver.graphColoringInitializeColor(current)
+        prop = Propagator(solver, m)
+        if not prop.load(color):
+            continue
+        fixed = solver.colorToBoard(prop.color)
+        v = prop.queue.peekBest(prop.udeg)
+        if v is None:
+            solutions.append(fixed)
+            continue
+        row, col = solver.rowOf[v], solver.colOf[v]
+        free = prop.domain[v]
+        while free:
+            bit = free & -free
+            free ^= bit
+            child = [line[:] for line in fixed]
+            child[row][col] = bit.bit_length()
+            frontier.append(child)
+    return list(frontier), solutions
+
+
+def _runParts(task, boards, extra, workers, options, deadline, cancel, accept):
+    """
+    Runs task(board, *extra, deadline) for every board, on a pool of workers
+    processes (in this process when workers is 1). accept(*result) is called
+    with every result as it comes in and returns True to stop the other parts.
+    Returns EXHAUSTED_CANCELLED or EXHAUSTED_TIME when cancel or the deadline
+    stopped the parts early, otherwise None.
+    """
+    if workers == 1:
+        for board in boards:
+            if accept(*task(board, *extra, deadline, options, cancel)):
+                return None
+            if cancel is not None and cancel.isCancelled():
+                return EXHAUSTED_CANCELLED
+            if deadline is not None and time.time() >= deadline:
+                return EXHAUSTED_TIME
+        return None
+    event = multiprocessing.Event()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker,
+                             initargs=(options, event)) as pool:
+        pending = set(pool.submit(task, board, *extra, deadline) for board in boards)
+        try:
+            while pending:
+                finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if accept(*future.result()):
+                        return None
+                if cancel is not None and cancel.isCancelled():
+                    return EXHAUSTED_CANCELLED
+                if deadline is not None and time.time() >= deadline:
+                    return EXHAUSTED_TIME
+        finally:
+            # parts not started yet are dropped, the running ones stop at their next budget check
+            event.set()
+            for future in pending:
+                future.cancel()
+    return None
+
+
+def _checkCountOptions(options):
+    """
+    raises ValueError for options countSolutions would refuse, so that the
+    mistake shows here instead of inside every worker process
+    """
+    for key in options:
+        if key not in COUNT_OPTIONS:
+            raise ValueError("countSolutionsParallel does not take the option " + key)
+    mode = options.get("mode", "propagate")
+    if mode not in ("propagate", "dlx"):
+        raise ValueError("countSolutionsParallel supports the propagate and dlx modes, not " + str(mode))
+    if options.get("ordering", "mrv") not in ORDERINGS:
+        raise ValueError("Unknown vertex ordering : " + str(options["ordering"]))
+    valueOrder = options.get("valueOrder", "numeric")
+    if valueOrder not in VALUE_ORDERS:
+        raise ValueError("Unknown value ordering : " + str(valueOrder))
+    if valueOrder != "numeric" and mode != "propagate":
+        raise ValueError("countSolutions only orders values in the propagate mode")
+
+
+def _newStats(options):
+    stats = SolveStats()
+    stats.mode = options.get("mode", "propagate")
+    stats.ordering = options.get("ordering", "mrv")
+    stats.iterative = options.get("iterative", True)
+    stats.valueOrder = options.get("valueOrder", "numeric")
+    stats.seed = options.get("seed")
+    return stats
+
+
+def _addStats(total, partStats):
+    """ adds the counters of one subproblem, keeps the first budget limit one of them hit """
+    total.add(partStats)
+    if total.exhausted is None and partStats["exhausted"] not in (None, EXHAUSTED_CANCELLED):
+        total.exhausted = partStats["exhausted"]
+
+
+def solveParallel(solver, board, workers=None, parts=None, timeLimit=None, cancel=None, **options):
+    """
+    Solves one board on a process pool, see the module docstring.
+    workers : number of processes (default os.cpu_count()), 1 solves the parts in this process
+    parts : subproblems to split the board into, at least (default 8 per worker)
+    timeLimit : seconds the whole solve may take
+    cancel : optional budget.CancelToken stopping the whole solve
+    options : passed to solveGraphColoring for every subproblem (mode, ordering,
+              nodeLimit, ...). A nodeLimit applies to each subproblem.
+
+    Returns (color, stats) like solveGraphColoring. The solution is the first
+    one a worker finds, so with several solutions it may change from run to
+    run. stats adds up the counters of the subproblems that finished,
+    stats.parts is the number of subproblems.
+    """
+    start = time.perf_counter()
+    deadline = None if timeLimit is None else time.time() + timeLimit
+    stats = _newStats(options)
+    stats.conflicts = findConflicts(board)
+    found = []
+    if not stats.conflicts:
+        workers = workers or os.cpu_count() or 1
+        boards, found = splitBoard(solver, board, parts or 8 * workers, options.get("m"))
+        stats.parts = len(boards)
+        stats.setupTime = time.perf_counter() - start
+
+        def accept(solution, partStats):
+            _addStats(stats, partStats)
+            if solution is not None:
+                found.append(solution)
+            return solution is not None
+
+        if not found:
+            stopped = _runParts(_solvePart, boards, (), workers, options, deadline, cancel, accept)
+            stats.exhausted = stopped or stats.exhausted
+    color = None
+    if found:
+        color, given = solver.graphColoringInitializeColor(found[0])
+        stats.exhausted = None
+    stats.elapsed = time.perf_counter() - start
+    return color, stats
+
+
+def countSolutionsParallel(solver, board, limit=2, workers=None, parts=None, timeLimit=None,
+                           cancel=None, **options):
+    """
+    Counts the solutions of one board on a process pool, stopping once limit
+    of them are found (limit=None counts them all).
+    workers, parts, timeLimit, cancel : as for solveParallel
+    options : passed to countSolutions for every subproblem, only m, mode
+              ("propagate" or "dlx"), ordering, nodeLimit, valueOrder and seed
+              are accepted (ValueError otherwise, before any process starts).
+              A nodeLimit applies to each subproblem.
+
+    Returns (count, stats) like countSolutions. When stats.exhausted is set,
+    count is what was found until then.
+    """
+    _checkCountOptions(options)
+    start = time.perf_counter()
+    deadline = None if timeLimit is None else time.time() + timeLimit
+    stats = _newStats(options)
+    stats.conflicts = findConflicts(board)
+    count = [0]
+    if not stats.conflicts:
+        workers = workers or os.cpu_count() or 1
+        boards, solutions = splitBoard(solver, board, parts or 8 * workers, options.get("m"))
+        stats.parts = len(boards)
+        stats.setupTime = time.perf_counter() - start
+        count[0] = len(solutions)
+
+        def accept(partCount, partStats):
+            _addStats(stats, partStats)
+            count[0] += partCount
+            return limit is not None and count[0] >= limit
+
+        if limit is None or count[0] < limit:
+            stopped = _runParts(_countPart, boards, (limit,), workers, options, deadline, cancel,
+                                accept)
+            stats.exhausted = stopped or stats.exhausted
+        if limit is not None and count[0] >= limit:
+            count[0] = limit
+            stats.exhausted = None
+    stats.elapsed = time.perf_counter() - start
+    return count[0], stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve one puzzle line on all the cores.")
+    parser.add_argument("puzzle", help="puzzle line, 0 or . for a blank")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--parts", type=int)
+    parser.add_argument("--mode", default="propagate")
+    parser.add_argument("--time-limit", type=float)
+    parser.add_argument("--count", action="store_true", help="count the solutions (up to 2)")
+    args = parser.parse_args()
+    puzzle = boardFromLine(args.puzzle)
+    solver = getSolver(boxSizeOf(len(puzzle) ** 2))
+    if args.count:
+        result, stats = countSolutionsParallel(solver, puzzle, workers=args.workers, parts=args.parts,
+                                               timeLimit=args.time_limit, mode=args.mode)
+    else:
+        color, stats = solveParallel(solver, puzzle, workers=args.workers, parts=args.parts,
+                                     timeLimit=args.time_limit, mode=args.mode)
+        result = "-" if color is None else boardToLine(solver.colorToBoard(color))
+    print(result)
+    print(stats)
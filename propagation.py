@@ -0,0 +1,349 @@
+from time import perf_counter
+from ordering import BucketQueue
+
+
+NAKED = "naked"  # ReasonPropagator.reason of a naked single
+
+
+def popcount(x):
+    """ number of set bits, i.e. number of colours left in a domain """
+    return bin(x).count("1")
+
+
+class Propagator:
+
+    def __init__(self, solver, m, hiddenSingles=True):
+        """
+        Candidate domains and inference for one solve.
+        solver : SudokuSolver giving the graph, the units and the neighbours
+        m : number of colours, bit c-1 of a domain stands for colour c
+        hiddenSingles : False limits inference to naked singles (used for grading)
+
+        domain[v] is the bitmask of colours still possible for vertex v and
+        color[v] is its colour once assigned (0 otherwise). Every change is
+        pushed on the trail so a failed branch is undone with undo(mark).
+        The uncoloured vertices are kept in a BucketQueue keyed by domain size,
+        udeg[v] counts the uncoloured neighbours of v and breaks its ties.
+
+        onForced / onUnforced : optional callbacks f(vertex, colour, depth) called
+        when inference forces a colour and when undo takes it back, depth being
+        the search depth the searches keep in self.depth. The colours the search
+        chooses itself are reported by the search, not here.
+        """
+        self.m = m
+        self.full = (1 << m) - 1
+        self.totalV = solver.totalV
+        self.neighbours = solver.neighbours
+        self.units = solver.units
+        self.unitsOf = solver.unitsOf
+
+        self.domain = [self.full] * (self.totalV + 1)
+        self.color = [0] * (self.totalV + 1)
+        self.trail = []
+        self.pending = []  # assigned vertices whose colour is not yet removed from the neighbours
+        self.dirty = set()  # units to check for hidden singles
+        self.forced = 0  # colours assigned by inference instead of search
+        self.hiddenSingles = hiddenSingles
+        self.depth = 0
+        self.onForced = None
+        self.onUnforced = None
+        self.elapsed = 0.0  # seconds spent in propagate
+        self.udeg = [len(neighbours) for neighbours in self.neighbours]
+        self.queue = BucketQueue(m)
+        for v in range(1, self.totalV + 1):
+            self.queue.push(v, m)
+
+    def mark(self):
+        """ returns the current trail position for a later undo """
+        return len(self.trail)
+
+    def undo(self, mark):
+        """ restores every domain and colour changed since mark """
+        trail = self.trail
+        domain, color, queue = self.domain, self.color, self.queue
+        neighbours, udeg = self.neighbours, self.udeg
+        while len(trail) > mark:
+            # assigned : 0 for a domain change, 1 for a chosen or given colour, 2 for a forced one
+            v, oldDomain, assigned = trail.pop()
+            domain[v] = oldDomain
+            if assigned:
+                if assigned == 2 and self.onUnforced is not None:
+                    self.onUnforced(v, color[v], self.depth)
+                color[v] = 0
+                queue.push(v, popcount(oldDomain))
+                for u in neighbours[v]:
+                    udeg[u] += 1
+            else:
+                queue.move(v, popcount(oldDomain))
+        self.pending = []
+        self.dirty = set()
+
+    def assign(self, v, bit, reason=None):
+        """
+        Colours vertex v with the colour of bit.
+        reason : why v gets its colour, only kept by ReasonPropagator
+        Returns False when the colour is not in the domain of v.
+        """
+        if not self.domain[v] & bit:
+            return False
+        self.trail.append((v, self.domain[v], 1 if reason is None else 2))
+        self.domain[v] = bit
+        self.color[v] = bit.bit_length()
+        if reason is not None and self.onForced is not None:
+            self.onForced(v, self.color[v], self.depth)
+        udeg = self.udeg
+        for u in self.neighbours[v]:
+            udeg[u] -= 1
+        self.queue.remove(v)
+        self.pending.append(v)
+        self.dirty.update(self.unitsOf[v])
+        return True
+
+    def _remove(self, u, bit, by):
+        """
+        Removes a colour, used by the coloured vertex by, from the domain of
+        the uncoloured vertex u.
+        A domain left with one colour is a naked single and gets assigned.
+        Returns False when the domain becomes empty.
+        """
+        old = self.domain[u]
+        if not old & bit:
+            return True
+        new = old ^ bit
+        if new == 0:
+            return False
+        self.trail.append((u, old, 0))
+        self.domain[u] = new
+        self.dirty.update(self.unitsOf[u])
+        if new & (new - 1) == 0:
+            self.forced += 1
+            return self.assign(u, new, NAKED)
+        self.queue.move(u, popcount(new))
+        return True
+
+    def _hiddenSingles(self, unitId):
+        """
+        Assigns every colour that fits only one vertex of the unit.
+        Returns False when some colour fits no vertex at all.
+        """
+        unit = self.units[unitId]
+        domain, color = self.domain, self.color
+        seen = 0
+        multi = 0
+        placed = 0
+        for u in unit:
+            d = domain[u]
+            if color[u]:
+                placed |= d
+            else:
+                multi |= seen & d
+                seen |= d
+        missing = self.full & ~(seen | placed)
+        if missing:
+            return self._missing(unit, missing & -missing)
+        singles = seen & ~multi & ~placed
+        while singles:
+            bit = singles & -singles
+            singles ^= bit
+            for u in unit:
+                if domain[u] & bit:
+                    if color[u] == 0:
+                        self.forced += 1
+                        if not self.assign(u, bit, unitId):
+                            return False
+                    break
+        return True
+
+    def propagate(self):
+        """
+        Runs inference to a fixpoint. On the sudoku graph every constraint is
+        "colours differ", so arc consistency (AC-3) amounts to removing the
+        colour of each assigned vertex from its neighbours; the pending list
+        plays the role of the AC-3 arc queue. Hidden singles are then looked
+        for in the units whose domains changed.
+        Returns False as soon as a contradiction is found.
+        """
+        start = perf_counter()
+        consistent = self.__fixpoint()
+        self.elapsed += perf_counter() - start
+        return consistent
+
+    def __fixpoint(self):
+        neighbours, color, domain = self.neighbours, self.color, self.domain
+        while self.pending or self.dirty:
+            while self.pending:
+                v = self.pending.pop()
+                bit = domain[v]
+                for u in neighbours[v]:
+                    if color[u] == 0:
+                        if not self._remove(u, bit, v):
+                            return False
+                    elif domain[u] == bit:
+                        return self._clash(u, v)
+            if not self.hiddenSingles:
+                self.dirty = set()
+            elif self.dirty:
+                dirty = self.dirty
+                self.dirty = set()
+                for unit in dirty:
+                    if not self._hiddenSingles(unit):
+                        return False
+        return True
+
+    def _clash(self, u, v):
+        """ called when the coloured neighbours u and v got the same colour, returns False """
+        return False
+
+    def _missing(self, unit, bit):
+        """ called when no vertex of the unit can take the colour of bit, returns False """
+        return False
+
+    def exclude(self, v, bit):
+        """
+        Removes the colour of bit from the domain of vertex v, e.g. to look
+        for a solution other than a known one. Call propagate() next.
+        Returns False when v is left without a colour.
+        """
+        return self._remove(v, bit, 0)
+
+    def load(self, color):
+        """
+        Assigns the given colours of a color list and propagates them.
+        Returns False when the givens contradict each other.
+        """
+        for v in range(1, self.totalV + 1):
+            if color[v] != 0:
+                bit = 1 << (color[v] - 1)
+                if not self.assign(v, bit):
+                    return False
+        return self.propagate()
+
+    def loadDomains(self, color, domains):
+        """
+        Starts a fresh Propagator from a partial colouring without assigning
+        its colours one by one : color[v] is the colour of v or 0, and
+        domains[v] the colours left for each uncoloured v, from which the
+        caller already took out the colours of its coloured neighbours.
+        The coloured vertices are never undone. Returns False on a contradiction.
+        """
+        neighbours, udeg = self.neighbours, self.udeg
+        self.queue = BucketQueue(self.m)
+        for v in range(1, self.totalV + 1):
+            c = color[v]
+            if c:
+                self.color[v] = c
+                self.domain[v] = 1 << (c - 1)
+        naked = []
+        for v in range(1, self.totalV + 1):
+            if not color[v]:
+                d = domains[v]
+                if d == 0:
+                    return False
+                self.domain[v] = d
+                # only the uncoloured vertices are ever ranked by udeg
+                udeg[v] = sum(1 for u in neighbours[v] if not color[u])
+                self.queue.push(v, popcount(d))
+                self.dirty.update(self.unitsOf[v])
+                if d & (d - 1) == 0:
+                    naked.append(v)
+        for v in naked:
+            if not self.color[v]:
+                self.forced += 1
+                if not self.assign(v, self.domain[v], NAKED):
+                    return False
+        return self.propagate()
+
+    def isComplete(self):
+        """ True when every vertex has a colour """
+        return len(self.queue) == 0
+
+
+class ReasonPropagator(Propagator):
+
+    def __init__(self, solver, m):
+        """
+        Propagator that also records why every domain value went away, for
+        the conflict-directed backjumping search ("backjump" mode).
+        Inference is the one of Propagator, plus :
+        removedBy[u][c] : the coloured vertex whose colour c removed c from u
+        reason[v] : why v got its colour : None when the search chose it, NAKED
+                    for a naked single, the unit number for a hidden single, or
+                    a list of vertices. The vertices behind the first two are
+                    only worked out by explain, when a conflict needs them.
+        level[v] : search depth at which v got its colour, 0 for the givens
+        order[v] : trail position of the colouring of v, tells which of two
+                   coloured vertices got its colour first
+        conflict : after a failed assign / propagate, vertices whose colours
+                   together caused the contradiction
+        """
+        Propagator.__init__(self, solver, m)
+        self.removedBy = [[0] * (m + 1) for _ in range(self.totalV + 1)]
+        self.reason = [None] * (self.totalV + 1)
+        self.level = [0] * (self.totalV + 1)
+        self.order = [0] * (self.totalV + 1)
+        self.conflict = []
+
+    def assign(self, v, bit, reason=None):
+        if not self.domain[v] & bit:
+            self.conflict = [self.removedBy[v][bit.bit_length()]]
+            return False
+        self.order[v] = len(self.trail)
+        self.reason[v] = reason
+        self.level[v] = self.depth
+        return Propagator.assign(self, v, bit, reason)
+
+    def _remove(self, u, bit, by):
+        old = self.domain[u]
+        if old & bit:
+            removedBy = self.removedBy[u]
+            removedBy[bit.bit_length()] = by
+            if old == bit:
+                self.conflict = removedBy[1:]
+                return False
+        return Propagator._remove(self, u, bit, by)
+
+    def _clash(self, u, v):
+        self.conflict = [u, v]
+        return False
+
+    def _missing(self, unit, bit):
+        # every vertex of the unit is coloured, or had the colour removed
+        c = bit.bit_length()
+        color, removedBy = self.color, self.removedBy
+        self.conflict = [w if color[w] else removedBy[w][c] for w in unit]
+        return False
+
+    def explain(self, vertices):
+        """
+        Follows the reasons of forced colours back to the vertices the search
+        coloured itself. Returns that set, givens and depth 0 colours left out.
+        """
+        reason, level, order = self.reason, self.level, self.order
+        color, removedBy = self.color, self.removedBy
+        decisions = set()
+        seen = set()
+        stack = list(vertices)
+        while stack:
+            w = stack.pop()
+            if w in seen:
+                continue
+            seen.add(w)
+            if w == 0 or level[w] == 0:
+                continue
+            why = reason[w]
+            c = color[w]
+            if why is None:
+                decisions.add(w)
+            elif why is NAKED:
+                # every other colour was removed from w
+                stack.extend(by for other, by in enumerate(removedBy[w]) if other and other != c)
+            elif isinstance(why, int):
+                # no other vertex of the unit could take c : it was coloured
+                # before w, or c had been removed from it
+                for x in self.units[why]:
+                    if x != w:
+                        stack.append(x if color[x] and order[x] < order[w] else removedBy[x][c])
+            else:
+                stack.extend(why)
+        return decisions
+
@@ -0,0 +1,111 @@
+import mmap
+import sys
+
+'''
+Text format of a puzzle : one line per board, the cells row by row, one
+character per cell. The characters are the ones printBoard draws on the
+board, "0" for a blank then "1".."9", "A".."G" for 10..16, and further
+letters for the larger boards. "." is also read as a blank.
+'''
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+VALUES = dict((ch, value) for value, ch in enumerate(DIGITS))
+VALUES["."] = 0
+
+NO_SOLUTION = "no solution"  # written instead of a solution line
+BUDGET_EXHAUSTED = "budget exhausted"  # written when the solve ran out of time or nodes
+INVALID_PUZZLE = "invalid puzzle"  # written, with the reason, for a line that does not parse
+
+
+def boxSizeOf(cells):
+    """ returns the box size of a board with this many cells, or raises ValueError """
+    size = int(round(cells ** 0.5))
+    boxSize = int(round(size ** 0.5))
+    if boxSize < 1 or boxSize ** 4 != cells:
+        raise ValueError("A puzzle line must have boxSize^4 cells, got " + str(cells))
+    return boxSize
+
+
+def boardFromLine(line):
+    """ parses one puzzle line into a board (list of rows of ints) """
+    line = line.strip()
+    size = boxSizeOf(len(line)) ** 2
+    try:
+        values = [VALUES[ch] for ch in line]
+    except KeyError as e:
+        raise ValueError("Unknown digit in puzzle line : " + str(e))
+    if max(values) > size:
+        raise ValueError("Digit too large for a %dx%d board" % (size, size))
+    return [values[row * size:(row + 1) * size] for row in range(size)]
+
+
+def boardToLine(board):
+    """ formats a board as one puzzle line """
+    return "".join(DIGITS[value] for row in board for value in row)
+
+
+def readLines(path="-"):
+    """
+    Yields the non empty lines of a puzzle file one at a time.
+    path : file name, or "-" for stdin
+    Files are memory mapped so even a very large corpus is never read into
+    memory as a whole, only the current line is held.
+    Bytes that are not ASCII are replaced (by U+FFFD), so such a line still
+    reaches boardFromLine and is rejected there as a single bad puzzle.
+    """
+    if path == "-":
+        for raw in sys.stdin.buffer:
+            line = raw.strip()
+            if line:
+                yield line.decode("ascii", errors="replace")
+        return
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty files can not be mapped
+            return
+        with data:
+            for raw in iter(data.readline, b""):
+                line = raw.strip()
+                if line:
+                    yield line.decode("ascii", errors="replace")
+
+
+def parseBoards(lines):
+    """ generator turning puzzle lines into boards, blank lines are skipped """
+    for line in lines:
+        if line.strip():
+            yield boardFromLine(line)
+
+
+def formatBoards(boards):
+    """
+    generator turning boards into lines, None stands for no solution and
+    BUDGET_EXHAUSTED is written as it is
+    """
+    for board in boards:
+        if board is None:
+            yield NO_SOLUTION
+        elif board is BUDGET_EXHAUSTED:
+            yield BUDGET_EXHAUSTED
+        else:
+            yield boardToLine(board)
+
+
+def writeLines(lines, path="-"):
+    """
+    Writes the lines as they come, to a file or to stdout for "-".
+    Returns the number of lines written.
+    """
+    count = 0
+    f = sys.stdout if path == "-" else open(path, "w")
+    try:
+        for line in lines:
+            f.write(line + "\n")
+            count += 1
+    finally:
+        if f is not sys.stdout:
+            f.close()
+        else:
+            f.flush()
+    return count
@@ -0,0 +1,90 @@
+import time
+from budget import EXHAUSTED_NODES
+from solver import SolveStats
+
+'''
+Randomized restarts for the heavy tail of backtracking searches. The first
+run is the plain deterministic search, which is the fastest on most boards.
+Every later run gets its own seed, so it breaks the ties of the vertex
+ordering and orders the colours differently. Each run has a node cutoff :
+a run that hits it is dropped and the next one starts with a new seed.
+The cutoffs follow the Luby sequence (1 1 2 1 1 2 4 1 1 2 ...) or grow
+geometrically, times a base cutoff. Either way they grow without bound, so some run eventually finishes
+and a board without a solution is still reported as such.
+'''
+
+RESTART_STRATEGIES = ("luby", "geometric")
+
+
+def luby(i):
+    """ i-th term of the Luby sequence, counted from 1 """
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while (1 << k) - 1 != i:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+def cutoffs(strategy="luby", base=64, factor=1.5):
+    """ yields the node cutoff of every run, endlessly """
+    if strategy not in RESTART_STRATEGIES:
+        raise ValueError("Unknown restart strategy : " + str(strategy))
+    i = 1
+    cutoff = float(base)
+    while True:
+        if strategy == "luby":
+            yield base * luby(i)
+        else:
+            yield int(cutoff)
+            cutoff *= factor
+        i += 1
+
+
+def solveWithRestarts(solver, board, strategy="luby", base=None, factor=1.5, seed=0,
+                      mode="propagate", ordering="mrv", valueOrder="random",
+                      timeLimit=None, cancel=None, **options):
+    """
+    Solves the board with SudokuSolver.solveGraphColoring, restarting with
+    the next seed every time a run reaches its node cutoff.
+    strategy : "luby" or "geometric", see cutoffs
+    base : node cutoff of the first run (the Luby unit), by default the
+           number of cells, so it scales with the board size
+    factor : growth of the geometric cutoffs
+    seed : run i > 0 uses seed + i and valueOrder; run 0 orders the colours
+           numerically and breaks ties without a seed, like a solve without restarts
+    timeLimit, cancel : budget of the whole solve, all runs included
+    mode, ordering and the other options are passed to every run.
+    A seed changes the colour order of the "propagate", "bitmask" and "backjump"
+    modes with the random and lcv value orders, and the vertex tie-breaks of the
+    "propagate" and "backjump" modes.
+
+    Returns (color, stats) like solveGraphColoring. stats adds up the counters
+    of every run, stats.restarts is the number of runs dropped.
+    """
+    total = SolveStats()
+    total.mode, total.ordering, total.iterative = mode, ordering, options.get("iterative", True)
+    total.valueOrder, total.seed = valueOrder, seed
+    deadline = None if timeLimit is None else time.perf_counter() + timeLimit
+    start = time.perf_counter()
+    color = None
+    if base is None:
+        base = solver.totalV
+    for run, nodeLimit in enumerate(cutoffs(strategy, base, factor)):
+        remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+        color, stats = solver.solveGraphColoring(board, mode=mode, ordering=ordering,
+                                                 valueOrder="numeric" if run == 0 else valueOrder,
+                                                 seed=None if run == 0 else seed + run,
+                                                 nodeLimit=nodeLimit, timeLimit=remaining,
+                                                 cancel=cancel, **options)
+        total.add(stats)
+        total.conflicts = stats.conflicts
+        total.exhausted = stats.exhausted
+        if stats.exhausted != EXHAUSTED_NODES:
+            break
+        total.restarts += 1
+    total.elapsed = time.perf_counter() - start
+    return color, total
@@ -0,0 +1,289 @@
+import argparse
+import random
+import sys
+import time
+from budget import Budget, BudgetExhausted
+from propagation import Propagator
+from puzzleio import boardFromLine
+from solver import getSolver
+from validator import findConflicts
+
+'''
+Incremental solving for an editor where the clues change one cell at a time.
+A SolveSession keeps the last solution with the used-colour bitmasks of its
+rows, columns and blocks, and the digit counts of the clues. An edit first
+checks whether the last solution still fits, then only searches again the
+cells around the edited one, widening the region when it can not be
+completed and falling back to a full solve as the last step. A region is
+searched on the domains of a Propagator loaded with the colours around it,
+so inference does most of the filling.
+'''
+
+KEPT = "kept"  # the last solution still fits the clues
+DIGITS = "digits"  # re-searched the cells holding the old or the new digit of the edited cell
+BANDS = "bands"  # re-searched the band and the stack of the edited cell
+FULL = "full"  # solved the whole board again
+CLASH = "clash"  # the clues clash, there is no solution
+EXHAUSTED = "exhausted"  # the full solve ran out of budget, whether there is a solution is unknown
+
+
+class SolveSession:
+
+    def __init__(self, board, solver=None, localNodes=2000, **options):
+        """
+        board : the starting clues, 0 for a blank (copied, not modified)
+        solver : SudokuSolver of the board size, made when not given
+        localNodes : nodes a local re-search may use before the next wider region is tried
+        options : passed to solveGraphColoring for the full solves (mode, timeLimit, ...)
+
+        After every edit lastEdit is (how, seconds, nodes), how being one of
+        KEPT, DIGITS, BANDS, FULL, CLASH or EXHAUSTED.
+        """
+        size = len(board)
+        self.solver = solver or getSolver(int(round(size ** 0.5)))
+        self.localNodes = localNodes
+        self.options = options
+        self.size = size
+        self.full = (1 << size) - 1
+        self.board = [row[:] for row in board]
+        self.given = set()
+        # clue counts per (unit, digit), clashes is the number of units holding a digit twice
+        self.counts = [[0] * (size + 1) for _ in range(3 * size)]
+        self.clashes = 0
+        self.color = None
+        self.rowUsed = self.colUsed = self.boxUsed = None
+        self.lastEdit = None
+        for row in range(size):
+            for col in range(size):
+                if board[row][col]:
+                    self.__addClue(self.solver.mappedGrid[row][col], board[row][col])
+        start = time.perf_counter()
+        how, nodes = self.__solveAll()
+        self.lastEdit = (how, time.perf_counter() - start, nodes)
+
+    def solution(self):
+        """
+        returns the current solution as a board, or None when there is none
+        or the full solve ran out of budget (lastEdit tells which)
+        """
+        if self.color is None:
+            return None
+        return self.solver.colorToBoard(self.color)
+
+    def setCell(self, row, col, value):
+        """
+        Sets (value 0 : clears) the clue of one cell and updates the solution.
+        Returns True when the new clues have a solution, False when they have
+        none or the full solve ran out of budget (lastEdit[0] is EXHAUSTED).
+        """
+        start = time.perf_counter()
+        v = self.solver.mappedGrid[row][col]
+        old = self.board[row][col]
+        if old == value:
+            self.lastEdit = (KEPT, time.perf_counter() - start, 0)
+            return self.color is not None
+        if old:
+            self.__removeClue(v, old)
+        self.board[row][col] = value
+        if value:
+            self.__addClue(v, value)
+
+        how, nodes = KEPT, 0
+        if self.clashes:
+            how = CLASH
+            self.color = None
+        elif self.color is None:
+            how, nodes = self.__solveAll()
+        elif value and self.color[v] != value:
+            how, nodes = self.__repair(v, value)
+        self.lastEdit = (how, time.perf_counter() - start, nodes)
+        return self.color is not None
+
+    def __addClue(self, v, value):
+        self.given.add(v)
+        for unit in self.solver.unitsOf[v]:
+            self.counts[unit][value] += 1
+            if self.counts[unit][value] == 2:
+                self.clashes += 1
+
+    def __removeClue(self, v, value):
+        self.given.discard(v)
+        for unit in self.solver.unitsOf[v]:
+            self.counts[unit][value] -= 1
+            if self.counts[unit][value] == 1:
+                self.clashes -= 1
+
+    def __solveAll(self):
+        """
+        solves the clues from scratch and rebuilds the bitmasks.
+        Returns (how, nodes used), how being FULL, CLASH or EXHAUSTED.
+        """
+        if self.clashes:
+            self.color = None
+            return CLASH, 0
+        color, stats = self.solver.solveGraphColoring(self.board, **self.options)
+        self.color = color
+        if color is not None:
+            # a complete solution uses every colour in every unit
+            size = self.size
+            self.rowUsed = [self.full] * size
+            self.colUsed = [self.full] * size
+            self.boxUsed = [self.full] * size
+        return (FULL if stats.exhausted is None else EXHAUSTED), stats.nodes
+
+    def __repair(self, v, value):
+        """
+        Puts value on v and completes the solution again by clearing a region
+        around v, smallest first, then the whole board :
+        - the cells holding the old or the new digit of v. Every unit then has
+          two cells to fill with those two digits, which mostly amounts to
+          swapping them along a chain of cells.
+        - those cells plus the band and the stack of v
+        A region is loaded in a Propagator, its cells getting the colours the
+        rest of the colouring leaves them, and searched there under a budget
+        of localNodes. Each region holds the one before, so a region that
+        could not be completed leaves no blank behind once the next one is filled.
+        Returns (how, nodes).
+        """
+        solver = self.solver
+        digits = (self.color[v], value)
+        digitCells = set(u for u in range(1, solver.totalV + 1) if self.color[u] in digits)
+        band = solver.rowOf[v] // solver.boxSize
+        stack = solver.colOf[v] // solver.boxSize
+        bandCells = set(u for u in range(1, solver.totalV + 1)
+                        if solver.rowOf[u] // solver.boxSize == band or
+                        solver.colOf[u] // solver.boxSize == stack)
+        regions = [(DIGITS, digitCells), (BANDS, digitCells | bandCells)]
+        nodes = 0
+        rowOf, colOf, boxOf = solver.rowOf, solver.colOf, solver.boxOf
+        for how, region in regions:
+            free = [u for u in region if u not in self.given]
+            for u in free:
+                self.__unset(u)
+            self.__unset(v)
+            self.__set(v, value)
+            domains = [0] * (solver.totalV + 1)
+            for u in free:
+                domains[u] = ~(self.rowUsed[rowOf[u]] | self.colUsed[colOf[u]] |
+                               self.boxUsed[boxOf[u]]) & self.full
+            prop = Propagator(solver, self.size)
+            budget = Budget(nodeLimit=self.localNodes).start()
+            counter = [0]
+            try:
+                solved = prop.loadDomains(self.color, domains) and self.__fill(prop, budget, counter)
+            except BudgetExhausted:
+                solved = False
+            nodes += counter[0]
+            if solved:
+                for u in free:
+                    self.__set(u, prop.color[u])
+                return how, nodes
+        how, more = self.__solveAll()
+        return how, nodes + more
+
+    def __set(self, v, c):
+        bit = 1 << (c - 1)
+        solver = self.solver
+        self.color[v] = c
+        self.rowUsed[solver.rowOf[v]] |= bit
+        self.colUsed[solver.colOf[v]] |= bit
+        self.boxUsed[solver.boxOf[v]] |= bit
+
+    def __unset(self, v):
+        c = self.color[v]
+        if c:
+            bit = 1 << (c - 1)
+            solver = self.solver
+            self.color[v] = 0
+            self.rowUsed[solver.rowOf[v]] &= ~bit
+            self.colUsed[solver.colOf[v]] &= ~bit
+            self.boxUsed[solver.boxOf[v]] &= ~bit
+
+    def __fill(self, prop, budget, counter):
+        """
+        Colours the uncoloured vertices of prop, most constrained first,
+        propagating every colour. True on success, prop then holds the colouring.
+        """
+        best = prop.queue.peekBest(prop.udeg)
+        if best is None:
+            return True
+        free = prop.domain[best]
+        while free:
+            bit = free & -free
+            free ^= bit
+            counter[0] += 1
+            if counter[0] >= budget.nextCheck:
+                budget.check(counter[0])
+            mark = prop.mark()
+            if prop.assign(best, bit) and prop.propagate() and self.__fill(prop, budget, counter):
+                return True
+            prop.undo(mark)
+        return False
+
+
+def _solutionFits(clues, solution):
+    """ True when solution is a complete board keeping the clues and the unit rules """
+    size = len(clues)
+    return (all(all(row) for row in solution) and not findConflicts(solution) and
+            all(solution[row][col] == clues[row][col]
+                for row in range(size) for col in range(size) if clues[row][col]))
+
+
+def randomEdits(board, edits=150, seed=0, **options):
+    """
+    Checks a SolveSession against random clue edits. While the clues have
+    no solution one of them is cleared, the way a user backs out of a
+    mistake. Otherwise a random cell loses its clue half of the time, or
+    gets one of the digits propagation leaves it (the current solution's
+    among them), so most edits keep a solution and go through the local
+    repairs. After every edit the solution must fit the clues and the unit
+    rules, and a board reported without solution must have none.
+    Returns (edits made, wrong edits, {how : count}).
+    """
+    session = SolveSession(board, **options)
+    solver = session.solver
+    size = len(board)
+    rnd = random.Random(seed)
+    made = wrong = 0
+    hows = dict()
+    for _ in range(edits):
+        row, col = rnd.randrange(size), rnd.randrange(size)
+        clues = [(r, c) for r in range(size) for c in range(size) if session.board[r][c]]
+        if session.color is None and clues:
+            (row, col), value = rnd.choice(clues), 0
+        elif session.board[row][col] and rnd.random() < 0.5:
+            value = 0
+        else:
+            trial = [line[:] for line in session.board]
+            trial[row][col] = 0
+            color, given = solver.graphColoringInitializeColor(trial)
+            prop = Propagator(solver, size)
+            if not prop.load(color):
+                continue
+            domain = prop.domain[solver.mappedGrid[row][col]]
+            value = rnd.choice([digit for digit in range(1, size + 1) if domain >> (digit - 1) & 1])
+        solved = session.setCell(row, col, value)
+        made += 1
+        how = session.lastEdit[0]
+        hows[how] = hows.get(how, 0) + 1
+        if solved:
+            ok = _solutionFits(session.board, session.solution())
+        elif how == EXHAUSTED:
+            ok = True  # nothing was claimed
+        else:
+            color, stats = solver.solveGraphColoring(session.board)
+            ok = color is None
+        if not ok:
+            wrong += 1
+    return made, wrong, hows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a solve session against random clue edits.")
+    parser.add_argument("puzzle", help="starting puzzle line, 0 or . for a blank")
+    parser.add_argument("--edits", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    made, wrong, hows = randomEdits(boardFromLine(args.puzzle), args.edits, args.seed)
+    print("%d edits, %d wrong, %s" % (made, wrong, hows))
+    sys.exit(1 if wrong else 0)
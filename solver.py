@@ -0,0 +1,1006 @@
+import random
+import time
+from budget import Budget, BudgetExhausted
+from sudokuconnections import getSudokuConnections
+from ordering import BucketQueue, ORDERINGS, VALUE_ORDERS
+from propagation import Propagator, ReasonPropagator
+from dlx import getExactCover
+from nogoods import NogoodStore
+from validator import findConflicts
+
+# The "backjump" search analyses BACKJUMP_PROBE dead ends, then goes on with plain
+# chronological backtracking when the levels its jumps skipped plus its nogood
+# hits stay under BACKJUMP_MIN_GAIN per dead end : explaining every failure then
+# costs more than the nodes it saves.
+BACKJUMP_PROBE = 256
+BACKJUMP_MIN_GAIN = 0.5
+
+
+class SolveStats:
+
+    # counters add() sums over several solves of one board (restarts, parallel parts)
+    SUMMED = ("visited", "nodes", "backtracks", "backjumps", "nogoods", "nogoodHits", "forced",
+              "valueChecks", "setupTime", "propagationTime", "searchTime")
+
+    def __init__(self):
+        '''
+        Counters collected while solving a single board.
+        mode, ordering, iterative : the engine and heuristic that ran
+        valueOrder, seed : the colour ordering and its random seed
+        restarts : number of times the search was started again (see restarts.py)
+        parts : number of subproblems the board was split into (see parallel.py)
+        visited : number of vertices the search branched on
+        nodes : number of (vertex, colour) assignments tried by the search
+        backtracks : number of times a colour had to be taken back
+        backjumps : levels the "backjump" search skipped when jumping back past
+                    vertices that had no part in a dead end
+        nogoods, nogoodHits : nogoods stored by the "backjump" search and the
+                              number of times one of them cut a branch
+        maxDepth : deepest level of the search stack
+        forced : number of colours assigned by propagation (naked and hidden singles)
+        valueChecks : neighbour tests spent scoring colours for the lcv value ordering,
+                      the cost to weigh against the nodes it saves
+        conflicts : (row, col) cells whose clues clash, the search is skipped when not empty
+        setupTime : seconds spent validating the board and building the search state
+        propagationTime : seconds spent in Propagator.propagate
+        searchTime : seconds spent searching, propagation excluded
+        elapsed : wall clock seconds spent inside solveGraphColoring
+        exhausted : None, or why the search was stopped before it finished ("nodes",
+                    "time" or "cancelled", see budget.py). The colour returned is then
+                    None even though the board may have a solution, and the other
+                    counters cover the part of the search that ran.
+
+        onAssign / onBacktrack : optional callbacks f(vertex, colour, depth) called
+        by every search when a colour is tried / taken back (dlx : a matrix row is
+        chosen / dropped, reported as its vertex and colour). In the
+        propagate and backjump modes they are also called for the colours
+        inference forces, with the depth of the search step that forced them.
+        They are None by default and the searches then only pay one test per node.
+        budget : the budget.Budget the searches check, one without limits by default
+        pickValue : f(vertex, free colour mask) returning the bit of the next colour
+                    to try, None for the numeric order (lowest bit first)
+        tieBreak : list of random priorities indexed by vertex breaking the ties of
+                   the propagate and backjump searches' vertex ordering. None without
+                   a seed : ties then go to the most uncoloured neighbours (Propagator.udeg)
+        '''
+        self.mode = None
+        self.ordering = None
+        self.iterative = None
+        self.valueOrder = "numeric"
+        self.seed = None
+        self.restarts = 0
+        self.parts = 0
+        self.visited = 0
+        self.nodes = 0
+        self.backtracks = 0
+        self.backjumps = 0
+        self.nogoods = 0
+        self.nogoodHits = 0
+        self.maxDepth = 0
+        self.forced = 0
+        self.valueChecks = 0
+        self.conflicts = []
+        self.setupTime = 0.0
+        self.propagationTime = 0.0
+        self.searchTime = 0.0
+        self.elapsed = 0.0
+        self.exhausted = None
+        self.onAssign = None
+        self.onBacktrack = None
+        self.budget = Budget()
+        self.pickValue = None
+        self.tieBreak = None
+
+    def add(self, other):
+        """
+        Adds the counters of another solve, a SolveStats or its asDict(), to
+        these ones. maxDepth keeps the deepest of the two.
+        """
+        values = other if isinstance(other, dict) else other.__dict__
+        for key in self.SUMMED:
+            setattr(self, key, getattr(self, key) + values[key])
+        self.maxDepth = max(self.maxDepth, values["maxDepth"])
+
+    def asDict(self):
+        """ returns the counters as a plain dictionary, without the callbacks and the budget """
+        return dict((key, value) for key, value in self.__dict__.items()
+                    if key not in ("onAssign", "onBacktrack", "budget", "pickValue", "tieBreak"))
+
+    def __str__(self):
+        return str(self.asDict())
+
+
+class SudokuSolver:
+
+    def __init__(self, sudokuGraph=None, boxSize=4):
+        """
+        Headless graph colouring engine.
+        sudokuGraph : SudokuConnections object, the shared frozen graph of the
+                      box size is used when not given
+        boxSize : side of a block, only used when sudokuGraph is not given
+        Nothing in here touches Tk so it can be imported in worker processes.
+        """
+        if sudokuGraph is None:
+            sudokuGraph = getSudokuConnections(boxSize)
+        self.sudokuGraph = sudokuGraph
+        self.rows = sudokuGraph.rows
+        self.cols = sudokuGraph.cols
+        self.totalV = sudokuGraph.total_blocks
+        self.boxSize = sudokuGraph.boxSize
+        self.mappedGrid = self.getMappedMatrix()
+        self.rowOf, self.colOf, self.boxOf = self.__getUnitIndex()
+        self.units, self.unitsOf = self.__getUnits()
+        self.neighbours = ((),) + tuple(tuple(sudokuGraph.graph.getNode(v).getConnections())
+                                        for v in range(1, self.totalV + 1))
+
+    def getMappedMatrix(self):
+        """
+        Returns the rows x cols matrix mapping every cell of the board
+        to the id (1 to totalV) of its vertex in the graph.
+        """
+        matrix = [[0 for cols in range(self.cols)] for rows in range(self.rows)]
+        count = 1
+        for rows in range(self.rows):
+            for cols in range(self.cols):
+                matrix[rows][cols] = count
+                count += 1
+        return matrix
+
+    def __getUnitIndex(self):
+        """
+        Returns three lists indexed by vertex id giving the row, column
+        and block each vertex belongs to. Index 0 is unused.
+        """
+        rowOf = [0] * (self.totalV + 1)
+        colOf = [0] * (self.totalV + 1)
+        boxOf = [0] * (self.totalV + 1)
+        for row in range(self.rows):
+            for col in range(self.cols):
+                v = self.mappedGrid[row][col]
+                rowOf[v] = row
+                colOf[v] = col
+                boxOf[v] = (row // self.boxSize) * self.boxSize + col // self.boxSize
+        return rowOf, colOf, boxOf
+
+    def __getUnits(self):
+        """
+        Returns the list of units (every row, then every column, then every
+        block, each as a list of vertex ids) and, indexed by vertex id, the
+        three unit numbers the vertex belongs to.
+        """
+        size = self.rows
+        units = [[] for _ in range(3 * size)]
+        unitsOf = [()] * (self.totalV + 1)
+        for v in range(1, self.totalV + 1):
+            ids = (self.rowOf[v], size + self.colOf[v], 2 * size + self.boxOf[v])
+            for unit in ids:
+                units[unit].append(v)
+            unitsOf[v] = ids
+        return tuple(tuple(unit) for unit in units), tuple(unitsOf)
+
+    def graphColoringInitializeColor(self, board):
+        """
+        Initializes the colors for the graph based on the given board.
+
+        Returns:
+        - color (list): A list containing the colors for each vertex in the graph.
+        - given (set): The ids of vertices whose values are already given in the board.
+        """
+        color = [0] * (self.totalV + 1)
+        given = set()
+
+        for row in range(len(board)):
+            for col in range(len(board[row])):
+                if board[row][col] != 0:
+                    idx = self.mappedGrid[row][col]
+                    color[idx] = board[row][col]
+                    given.add(idx)
+
+        return color, given
+
+    def colorToBoard(self, color):
+        """ converts a color list back into a rows x cols board """
+        return [[color[self.mappedGrid[row][col]] for col in range(self.cols)]
+                for row in range(self.rows)]
+
+    def solveGraphColoring(self, board, m=None, mode="propagate", ordering="mrv", iterative=True,
+                           onAssign=None, onBacktrack=None, timeLimit=None, nodeLimit=None,
+                           cancel=None, valueOrder="numeric", seed=None):
+        """
+        Solves the board by colouring the sudoku graph with m colors
+        (default: one colour per digit, i.e. the number of rows).
+        The board itself is not modified. The clues are validated first and a
+        board with clashing clues is rejected without searching.
+
+        mode : "propagate" keeps a candidate domain per vertex and runs naked
+               singles, hidden singles and arc consistency after every assignment.
+               "bitmask" keeps used-colour bitmasks per row, column and block so
+               checking a colour is O(1). "scan" is the original search which
+               checks every vertex of the graph for each colour tried.
+               "dlx" solves the exact cover formulation with dancing links instead
+               of colouring the graph; the matrix is shared by all boards of a size.
+               "backjump" runs the same inference as "propagate" but keeps the reason
+               of every deduction; at a dead end it jumps straight back to the latest
+               vertex in the conflict set and records the conflicting partial
+               colouring in a bounded NogoodStore.
+        ordering : vertex ordering used by the colouring search, one of ordering.ORDERINGS.
+                   "static" colours the vertices in id order, "mrv" and "dsatur"
+                   always branch on the most constrained uncoloured vertex.
+        iterative : run the "propagate" and "bitmask" searches on an explicit stack
+                    instead of one recursive call per vertex. Both give the same
+                    colouring; the iterative one has no recursion depth limit.
+        onAssign, onBacktrack : optional callbacks, see SolveStats
+        timeLimit : seconds the solve may take, None for no limit
+        nodeLimit : most search nodes the solve may try, None for no limit
+        cancel : optional budget.CancelToken another thread can set to stop the solve
+        valueOrder : order the colours of a vertex are tried in, one of ordering.VALUE_ORDERS,
+                     for the "propagate", "bitmask" and "backjump" modes with any vertex ordering
+        seed : random seed of the lcv tie-break and of the random value order. In the
+               "propagate" and "backjump" modes it also breaks the ties of the vertex
+               ordering at random.
+
+        Returns:
+        - color (list): the colouring indexed by vertex id, or None when the board has no
+                        solution or the budget ran out (stats.exhausted tells which)
+        - stats (SolveStats): counters and per phase timings of the solve
+        """
+        if m is None:
+            m = self.rows
+        stats = SolveStats()
+        stats.mode, stats.ordering, stats.iterative = mode, ordering, iterative
+        stats.onAssign, stats.onBacktrack = onAssign, onBacktrack
+        stats.valueOrder, stats.seed = valueOrder, seed
+        stats.budget = Budget(timeLimit, nodeLimit, cancel).start()
+        start = time.perf_counter()
+        if ordering not in ORDERINGS:
+            raise ValueError("Unknown vertex ordering : " + str(ordering))
+        if valueOrder not in VALUE_ORDERS:
+            raise ValueError("Unknown value ordering : " + str(valueOrder))
+        if valueOrder != "numeric" and mode not in ("propagate", "bitmask", "backjump"):
+            raise ValueError("Value orderings need the propagate, bitmask or backjump mode, not " +
+                             str(mode))
+        stats.conflicts = findConflicts(board)
+        color, given = self.graphColoringInitializeColor(board)
+        stats.setupTime = time.perf_counter() - start
+        try:
+            color = self.__search(board, m, mode, ordering, iterative, color, given, stats, start)
+        except BudgetExhausted as e:
+            color = None
+            stats.exhausted = e.reason
+        stats.elapsed = time.perf_counter() - start
+        stats.searchTime = max(0.0, stats.elapsed - stats.setupTime - stats.propagationTime)
+        return color, stats
+
+    def __search(self, board, m, mode, ordering, iterative, color, given, stats, start):
+        """ runs the engine of solveGraphColoring, returns the colouring or None """
+        if stats.conflicts:
+            color = None
+        elif mode == "propagate":
+            prop = Propagator(self, m)
+            prop.onForced, prop.onUnforced = stats.onAssign, stats.onBacktrack
+            search = self.__propagateColorIterative if iterative else self.__propagateColorUtility
+            stats.pickValue = self.__valuePicker(stats, prop.domain.__getitem__, prop.color)
+            stats.tieBreak = self.__tieBreak(stats.seed)
+            stats.setupTime = time.perf_counter() - start
+            try:
+                if prop.load(color) and search(prop, ordering, stats):
+                    color = prop.color
+                else:
+                    color = None
+            finally:
+                stats.forced = prop.forced
+                stats.propagationTime = prop.elapsed
+        elif mode == "dlx":
+            color = self.__exactCoverSolve(board, stats)
+        elif mode == "bitmask":
+            masks = self.__initMasks(color)
+            stats.setupTime = time.perf_counter() - start
+            if masks is not None:
+                stats.pickValue = self.__valuePicker(stats, self.__maskDomain(m, masks), color)
+            if masks is None:
+                color = None
+            elif ordering == "static":
+                if iterative:
+                    solved = self.__bitmaskColorIterative(m, color, given, masks, stats)
+                else:
+                    solved = self.__bitmaskColorUtility(m, color, 1, given, masks, stats)
+                if not solved:
+                    color = None
+            else:
+                queue, udeg = self.__initQueue(m, color, masks)
+                search = self.__orderedColorIterative if iterative else self.__orderedColorUtility
+                stats.setupTime = time.perf_counter() - start
+                if not search(m, color, masks, queue, udeg, stats):
+                    color = None
+        elif mode == "backjump":
+            prop = ReasonPropagator(self, m)
+            prop.onForced, prop.onUnforced = stats.onAssign, stats.onBacktrack
+            stats.pickValue = self.__valuePicker(stats, prop.domain.__getitem__, prop.color)
+            stats.tieBreak = self.__tieBreak(stats.seed)
+            stats.setupTime = time.perf_counter() - start
+            try:
+                if prop.load(color) and self.__backjumpColorIterative(prop, ordering, stats, NogoodStore()):
+                    color = prop.color
+                else:
+                    color = None
+            finally:
+                stats.forced = prop.forced
+                stats.propagationTime = prop.elapsed
+        elif mode == "scan":
+            if ordering != "static":
+                raise ValueError("The scan mode only supports the static ordering")
+            if self.__graphColorUtility(m=m, color=color, v=1, given=given, stats=stats) is None:
+                color = None
+        else:
+            raise ValueError("Unknown solver mode : " + str(mode))
+        return color
+
+    def countSolutions(self, board, limit=2, m=None, mode="propagate", ordering="mrv",
+                       timeLimit=None, nodeLimit=None, cancel=None, valueOrder="numeric", seed=None):
+        """
+        Counts the solutions of the board, stopping as soon as limit of them
+        are found (limit=None counts them all). With the default limit of 2
+        the answer tells 0 (no solution), 1 (unique) or 2 (several).
+        mode : "propagate" (colouring search) or "dlx" (exact cover)
+        timeLimit, nodeLimit, cancel : as for solveGraphColoring. When the budget
+        runs out stats.exhausted is set and count is what was found until then.
+        valueOrder, seed : as for solveGraphColoring, propagate mode only
+
+        Returns:
+        - count (int): the number of solutions found, at most limit
+        - stats (SolveStats): counters collected during the search
+        """
+        if m is None:
+            m = self.rows
+        stats = SolveStats()
+        stats.mode, stats.ordering, stats.iterative = mode, ordering, True
+        stats.valueOrder, stats.seed = valueOrder, seed
+        stats.budget = Budget(timeLimit, nodeLimit, cancel).start()
+        if valueOrder not in VALUE_ORDERS:
+            raise ValueError("Unknown value ordering : " + str(valueOrder))
+        if valueOrder != "numeric" and mode != "propagate":
+            raise ValueError("countSolutions only orders values in the propagate mode")
+        start = time.perf_counter()
+        count = 0
+        stats.conflicts = findConflicts(board)
+        stats.setupTime = time.perf_counter() - start
+        if stats.conflicts:
+            pass
+        elif mode == "propagate":
+            color, given = self.graphColoringInitializeColor(board)
+            prop = Propagator(self, m)
+            stats.pickValue = self.__valuePicker(stats, prop.domain.__getitem__, prop.color)
+            stats.tieBreak = self.__tieBreak(stats.seed)
+            stats.setupTime = time.perf_counter() - start
+            try:
+                if prop.load(color):
+                    count = self.__propagateColorIterative(prop, ordering, stats, limit)
+            except BudgetExhausted as e:
+                stats.exhausted = e.reason
+                count = e.count
+            stats.forced = prop.forced
+            stats.propagationTime = prop.elapsed
+        elif mode == "dlx":
+            size = self.rows
+            givenRows = [(row * size + col) * size + board[row][col] - 1
+                         for row in range(size) for col in range(size) if board[row][col] != 0]
+            try:
+                rows, count = getExactCover(self.boxSize).search(givenRows, limit=limit, stats=stats)
+            except BudgetExhausted as e:
+                stats.exhausted = e.reason
+                count = e.count
+        else:
+            raise ValueError("countSolutions supports the propagate and dlx modes, not " + str(mode))
+        stats.elapsed = time.perf_counter() - start
+        stats.searchTime = max(0.0, stats.elapsed - stats.setupTime - stats.propagationTime)
+        return count, stats
+
+    def __maskDomain(self, m, masks):
+        """ returns f(vertex) giving the colours its row, column and block leave free """
+        rowUsed, colUsed, boxUsed = masks
+        rowOf, colOf, boxOf = self.rowOf, self.colOf, self.boxOf
+        full = (1 << m) - 1
+        return lambda u: ~(rowUsed[rowOf[u]] | colUsed[colOf[u]] | boxUsed[boxOf[u]]) & full
+
+    def __tieBreak(self, seed):
+        """ random priorities of the vertices drawn from seed, None when seed is None """
+        if seed is None:
+            return None
+        # a separate stream so the value order of the same seed is left alone
+        rnd = random.Random("vertices %s" % (seed,))
+        return [rnd.random() for _ in range(self.totalV + 1)]
+
+    def __valuePicker(self, stats, domainOf, color):
+        """
+        Builds the stats.pickValue function of the value ordering.
+        domainOf : f(vertex) giving the colours still legal for a vertex
+        color : the colouring being built, 0 for an uncoloured vertex
+        Returns None for the numeric order.
+        """
+        if stats.valueOrder == "numeric":
+            return None
+        rnd = random.Random(stats.seed)
+        if stats.valueOrder == "random":
+            def pickRandom(v, free):
+                bits = []
+                while free:
+                    bit = free & -free
+                    free ^= bit
+                    bits.append(bit)
+                return rnd.choice(bits)
+            return pickRandom
+
+        neighbours = self.neighbours
+        randomTies = stats.seed is not None
+
+        def pickLeastConstraining(v, free):
+            # domains of the uncoloured neighbours, each colour is scored by
+            # the number of them it would take an option from
+            domains = [domainOf(u) for u in neighbours[v] if color[u] == 0]
+            stats.valueChecks += len(domains)
+            best = bestKey = None
+            while free:
+                bit = free & -free
+                free ^= bit
+                score = sum(1 for domain in domains if domain & bit)
+                key = (score, rnd.random()) if randomTies else score
+                if best is None or key < bestKey:
+                    best, bestKey = bit, key
+            return best
+        return pickLeastConstraining
+
+    def __graphColorUtility(self, m, color, v, given, stats, depth=1):
+        # Base case: If all vertices are colored, return True
+        if v == self.totalV + 1:
+            return True
+
+        # depth counts the vertices the search colours itself, the givens are only checked
+        isGiven = v in given
+        if not isGiven:
+            stats.visited += 1
+            if depth > stats.maxDepth:
+                stats.maxDepth = depth
+
+        # Try different colors for vertex v
+        for c in range(1, m+1):
+            # Check if it is safe to assign color c to vertex v
+            if self.__isSafe2Color(v, color, c, given) == True:
+                # Assign color c to vertex v
+                stats.nodes += 1
+                if stats.nodes >= stats.budget.nextCheck:
+                    stats.budget.check(stats.nodes)
+                color[v] = c
+                if not isGiven and stats.onAssign is not None:
+                    stats.onAssign(v, c, depth)
+
+                if self.__graphColorUtility(m, color, v+1, given, stats,
+                                            depth if isGiven else depth + 1):
+                    # Recur to assign colors to the rest of the vertices
+                    return True
+                if not isGiven and stats.onBacktrack is not None:
+                    stats.onBacktrack(v, c, depth)
+                stats.backtracks += 1
+            # Backtrack: if vertex v is not given, then reset the color to 0 and try another color
+            if v not in given:
+                color[v] = 0
+
+    '''
+    This function checks if it is safe to assign a given color c to vertex v in the graph coloring algorithm.
+    If the vertex has already been given a value, then it returns True only if the color c matches the given value.
+    If the vertex has not been given a value, then it returns False if any of its neighbours have already been colored with c.
+    Otherwise, it returns True, indicating that it is safe to color the vertex with c.
+    '''
+
+    def __isSafe2Color(self, v, color, c, given):
+        if v in given and color[v] == c:
+            return True
+        elif v in given:
+            return False
+
+        for i in range(1, self.totalV+1):
+            if color[i] == c and self.sudokuGraph.graph.isNeighbour(v, i):
+                return False
+        return True
+
+    def __exactCoverSolve(self, board, stats):
+        """
+        Solves the board with Algorithm X and returns the color list, or None.
+        Matrix row ids are cell * size + (digit - 1), cells counted row by row.
+        """
+        size = self.rows
+        matrix = getExactCover(self.boxSize)
+        givenRows = [(row * size + col) * size + board[row][col] - 1
+                     for row in range(size) for col in range(size) if board[row][col] != 0]
+        rows, count = matrix.search(givenRows, stats=stats)
+        if rows is None:
+            return None
+        color = [0] * (self.totalV + 1)
+        for rowId in rows:
+            cell, digit = divmod(rowId, size)
+            color[self.mappedGrid[cell // size][cell % size]] = digit + 1
+        return color
+
+    def __initMasks(self, color):
+        """
+        Builds the used-colour bitmasks of every row, column and block from
+        the colours already on the board. Bit c-1 is set when colour c is used.
+        Returns None when two given cells of the same unit share a colour.
+        """
+        rowUsed = [0] * self.rows
+        colUsed = [0] * self.cols
+        boxUsed = [0] * self.rows
+        for v in range(1, self.totalV + 1):
+            if color[v] == 0:
+                continue
+            bit = 1 << (color[v] - 1)
+            r, c, b = self.rowOf[v], self.colOf[v], self.boxOf[v]
+            if (rowUsed[r] | colUsed[c] | boxUsed[b]) & bit:
+                return None
+            rowUsed[r] |= bit
+            colUsed[c] |= bit
+            boxUsed[b] |= bit
+        return rowUsed, colUsed, boxUsed
+
+    def __bitmaskColorUtility(self, m, color, v, given, masks, stats, depth=1):
+        """
+        Same search as __graphColorUtility but the legal colours of a vertex
+        come from a single mask operation on its row, column and block.
+        """
+        totalV = self.totalV
+        pickValue = stats.pickValue
+        while v <= totalV and v in given:
+            v += 1
+        if v == totalV + 1:
+            return True
+        stats.visited += 1
+        if depth > stats.maxDepth:
+            stats.maxDepth = depth
+
+        rowUsed, colUsed, boxUsed = masks
+        r, c, b = self.rowOf[v], self.colOf[v], self.boxOf[v]
+        free = ~(rowUsed[r] | colUsed[c] | boxUsed[b]) & ((1 << m) - 1)
+        while free:
+            bit = free & -free if pickValue is None else pickValue(v, free)
+            free ^= bit
+            stats.nodes += 1
+            if stats.nodes >= stats.budget.nextCheck:
+                stats.budget.check(stats.nodes)
+            color[v] = bit.bit_length()
+            if stats.onAssign is not None:
+                stats.onAssign(v, color[v], depth)
+            rowUsed[r] |= bit
+            colUsed[c] |= bit
+            boxUsed[b] |= bit
+            if self.__bitmaskColorUtility(m, color, v + 1, given, masks, stats, depth + 1):
+                return True
+            if stats.onBacktrack is not None:
+                stats.onBacktrack(v, color[v], depth)
+            rowUsed[r] ^= bit
+            colUsed[c] ^= bit
+            boxUsed[b] ^= bit
+            stats.backtracks += 1
+        color[v] = 0
+        return False
+
+    def __initQueue(self, m, color, masks):
+        """
+        Puts every uncoloured vertex in a BucketQueue keyed by its number of
+        legal colours and counts its uncoloured neighbours for the tie-break.
+        """
+        rowUsed, colUsed, boxUsed = masks
+        full = (1 << m) - 1
+        queue = BucketQueue(m)
+        udeg = [0] * (self.totalV + 1)
+        for v in range(1, self.totalV + 1):
+            if color[v] != 0:
+                continue
+            free = ~(rowUsed[self.rowOf[v]] | colUsed[self.colOf[v]] | boxUsed[self.boxOf[v]]) & full
+            queue.push(v, bin(free).count("1"))
+            udeg[v] = sum(1 for u in self.neighbours[v] if color[u] == 0)
+        return queue, udeg
+
+    def __orderedColorUtility(self, m, color, masks, queue, udeg, stats, depth=1):
+        """
+        Colours the most constrained vertex first. After each assignment the
+        uncoloured neighbours that lose the colour move down one bucket, and
+        the moves are undone on backtrack, so the queue is never rebuilt.
+        """
+        v = queue.popBest(udeg)
+        if v is None:
+            return True
+        stats.visited += 1
+        if depth > stats.maxDepth:
+            stats.maxDepth = depth
+
+        rowUsed, colUsed, boxUsed = masks
+        rowOf, colOf, boxOf = self.rowOf, self.colOf, self.boxOf
+        pickValue = stats.pickValue
+        r, c, b = rowOf[v], colOf[v], boxOf[v]
+        free = ~(rowUsed[r] | colUsed[c] | boxUsed[b]) & ((1 << m) - 1)
+        uncoloured = [u for u in self.neighbours[v] if color[u] == 0]
+        for u in uncoloured:
+            udeg[u] -= 1
+
+        while free:
+            bit = free & -free if pickValue is None else pickValue(v, free)
+            free ^= bit
+            stats.nodes += 1
+            if stats.nodes >= stats.budget.nextCheck:
+                stats.budget.check(stats.nodes)
+            color[v] = bit.bit_length()
+            if stats.onAssign is not None:
+                stats.onAssign(v, color[v], depth)
+
+            touched = [u for u in uncoloured
+                       if not (rowUsed[rowOf[u]] | colUsed[colOf[u]] | boxUsed[boxOf[u]]) & bit]
+            for u in touched:
+                queue.decrement(u)
+            rowUsed[r] |= bit
+            colUsed[c] |= bit
+            boxUsed[b] |= bit
+
+            if self.__orderedColorUtility(m, color, masks, queue, udeg, stats, depth + 1):
+                return True
+            if stats.onBacktrack is not None:
+                stats.onBacktrack(v, color[v], depth)
+
+            rowUsed[r] ^= bit
+            colUsed[c] ^= bit
+            boxUsed[b] ^= bit
+            for u in touched:
+                queue.increment(u)
+            stats.backtracks += 1
+
+        for u in uncoloured:
+            udeg[u] += 1
+        color[v] = 0
+        queue.push(v, bin(~(rowUsed[r] | colUsed[c] | boxUsed[b]) & ((1 << m) - 1)).count("1"))
+        return False
+
+    def __propagateColorUtility(self, prop, ordering, stats, depth=1):
+        """
+        Search on top of the Propagator. Each colour tried is followed by a
+        propagation pass, and a failed branch is undone through the trail.
+        """
+        if ordering == "static":
+            v = next((v for v in range(1, self.totalV + 1) if prop.color[v] == 0), None)
+        else:
+            v = prop.queue.peekBest(prop.udeg if stats.tieBreak is None else stats.tieBreak)
+        if v is None:
+            return True
+        stats.visited += 1
+        if depth > stats.maxDepth:
+            stats.maxDepth = depth
+
+        pickValue = stats.pickValue
+        free = prop.domain[v]
+        while free:
+            bit = free & -free if pickValue is None else pickValue(v, free)
+            free ^= bit
+            stats.nodes += 1
+            if stats.nodes >= stats.budget.nextCheck:
+                stats.budget.check(stats.nodes)
+            mark = prop.mark()
+            if stats.onAssign is not None:
+                stats.onAssign(v, bit.bit_length(), depth)
+            prop.depth = depth
+            if prop.assign(v, bit) and prop.propagate():
+                if self.__propagateColorUtility(prop, ordering, stats, depth + 1):
+                    return True
+            if stats.onBacktrack is not None:
+                stats.onBacktrack(v, bit.bit_length(), depth)
+            prop.undo(mark)
+            stats.backtracks += 1
+        return False
+
+    def __bitmaskColorIterative(self, m, color, given, masks, stats):
+        """
+        __bitmaskColorUtility without recursion. frees[i] holds the colours
+        not tried yet for the i-th blank vertex, which together with color
+        is the whole search stack. Colours are undone in place when the
+        search comes back to a level.
+        """
+        order = [v for v in range(1, self.totalV + 1) if v not in given]
+        if not order:
+            return True
+        rowUsed, colUsed, boxUsed = masks
+        rowOf, colOf, boxOf = self.rowOf, self.colOf, self.boxOf
+        full = (1 << m) - 1
+        last = len(order) - 1
+        onAssign, onBacktrack = stats.onAssign, stats.onBacktrack
+        budget = stats.budget
+        pickValue = stats.pickValue
+        frees = [0] * len(order)
+        v = order[0]
+        frees[0] = ~(rowUsed[rowOf[v]] | colUsed[colOf[v]] | boxUsed[boxOf[v]]) & full
+        stats.visited += 1
+        i = 0
+        while True:
+            v = order[i]
+            r, c, b = rowOf[v], colOf[v], boxOf[v]
+            if color[v]:
+                if onBacktrack is not None:
+                    onBacktrack(v, color[v], i + 1)
+                bit = 1 << (color[v] - 1)
+                rowUsed[r] ^= bit
+                colUsed[c] ^= bit
+                boxUsed[b] ^= bit
+                color[v] = 0
+                stats.backtracks += 1
+            free = frees[i]
+            if not free:
+                i -= 1
+                if i < 0:
+                    return False
+                continue
+            bit = free & -free if pickValue is None else pickValue(v, free)
+            frees[i] = free ^ bit
+            stats.nodes += 1
+            if stats.nodes >= budget.nextCheck:
+                budget.check(stats.nodes)
+            color[v] = bit.bit_length()
+            if onAssign is not None:
+                onAssign(v, color[v], i + 1)
+            rowUsed[r] |= bit
+            colUsed[c] |= bit
+            boxUsed[b] |= bit
+            if i == last:
+                stats.maxDepth = max(stats.maxDepth, i + 1)
+                return True
+            i += 1
+            if i >= stats.maxDepth:
+                stats.maxDepth = i + 1
+            stats.visited += 1
+            v = order[i]
+            frees[i] = ~(rowUsed[rowOf[v]] | colUsed[colOf[v]] | boxUsed[boxOf[v]]) & full
+
+    def __orderedColorIterative(self, m, color, masks, queue, udeg, stats):
+        """
+        __orderedColorUtility without recursion. Each stack frame is
+        [vertex, colours not tried yet, uncoloured neighbours, neighbours
+        moved down a bucket by the current colour].
+        """
+        rowUsed, colUsed, boxUsed = masks
+        rowOf, colOf, boxOf = self.rowOf, self.colOf, self.boxOf
+        full = (1 << m) - 1
+        onAssign, onBacktrack = stats.onAssign, stats.onBacktrack
+        budget = stats.budget
+        pickValue = stats.pickValue
+        stack = []
+
+        v = queue.popBest(udeg)
+        if v is None:
+            return True
+        while True:
+            if v is not None:
+                # open a frame for the newly selected vertex
+                free = ~(rowUsed[rowOf[v]] | colUsed[colOf[v]] | boxUsed[boxOf[v]]) & full
+                uncoloured = [u for u in self.neighbours[v] if color[u] == 0]
+                for u in uncoloured:
+                    udeg[u] -= 1
+                stack.append([v, free, uncoloured, None])
+                stats.visited += 1
+                if len(stack) > stats.maxDepth:
+                    stats.maxDepth = len(stack)
+
+            frame = stack[-1]
+            v, free, uncoloured, touched = frame
+            r, c, b = rowOf[v], colOf[v], boxOf[v]
+            if touched is not None:
+                if onBacktrack is not None:
+                    onBacktrack(v, color[v], len(stack))
+                bit = 1 << (color[v] - 1)
+                rowUsed[r] ^= bit
+                colUsed[c] ^= bit
+                boxUsed[b] ^= bit
+                for u in touched:
+                    queue.increment(u)
+                stats.backtracks += 1
+            if not free:
+                stack.pop()
+                for u in uncoloured:
+                    udeg[u] += 1
+                color[v] = 0
+                queue.push(v, bin(~(rowUsed[r] | colUsed[c] | boxUsed[b]) & full).count("1"))
+                if not stack:
+                    return False
+                v = None
+                continue
+
+            bit = free & -free if pickValue is None else pickValue(v, free)
+            frame[1] = free ^ bit
+            stats.nodes += 1
+            if stats.nodes >= budget.nextCheck:
+                budget.check(stats.nodes)
+            color[v] = bit.bit_length()
+            if onAssign is not None:
+                onAssign(v, color[v], len(stack))
+            touched = [u for u in uncoloured
+                       if not (rowUsed[rowOf[u]] | colUsed[colOf[u]] | boxUsed[boxOf[u]]) & bit]
+            for u in touched:
+                queue.decrement(u)
+            rowUsed[r] |= bit
+            colUsed[c] |= bit
+            boxUsed[b] |= bit
+            frame[3] = touched
+
+            v = queue.popBest(udeg)
+            if v is None:
+                return True
+
+    def __propagateColorIterative(self, prop, ordering, stats, limit=1):
+        """
+        __propagateColorUtility without recursion. Each stack frame is
+        [vertex, colours not tried yet, trail mark of the current colour, current colour].
+        After a complete colouring the search carries on backtracking until
+        limit colourings were found (None : all of them).
+        Returns the number of colourings found, prop holds the last one when
+        the search stopped on the limit.
+        When the budget runs out, the BudgetExhausted raised carries the
+        number of colourings found so far in its count attribute.
+        """
+        totalV = self.totalV
+        onAssign, onBacktrack = stats.onAssign, stats.onBacktrack
+        budget = stats.budget
+        pickValue = stats.pickValue
+        tieBreak = prop.udeg if stats.tieBreak is None else stats.tieBreak
+        stack = []
+        count = 0
+        while True:
+            if ordering == "static":
+                v = next((v for v in range(1, totalV + 1) if prop.color[v] == 0), None)
+            else:
+                v = prop.queue.peekBest(tieBreak)
+            if v is None:
+                count += 1
+                if limit is not None and count >= limit:
+                    return count
+            else:
+                stack.append([v, prop.domain[v], None, 0])
+                stats.visited += 1
+                if len(stack) > stats.maxDepth:
+                    stats.maxDepth = len(stack)
+
+            while stack:
+                frame = stack[-1]
+                v, free, mark = frame[0], frame[1], frame[2]
+                if mark is not None:
+                    if onBacktrack is not None:
+                        onBacktrack(v, frame[3], len(stack))
+                    prop.undo(mark)
+                    frame[2] = None
+                    stats.backtracks += 1
+                if not free:
+                    stack.pop()
+                    continue
+                bit = free & -free if pickValue is None else pickValue(v, free)
+                frame[1] = free ^ bit
+                stats.nodes += 1
+                if stats.nodes >= budget.nextCheck:
+                    try:
+                        budget.check(stats.nodes)
+                    except BudgetExhausted as e:
+                        e.count = count
+                        raise
+                frame[2] = prop.mark()
+                frame[3] = bit.bit_length()
+                if onAssign is not None:
+                    onAssign(v, frame[3], len(stack))
+                prop.depth = len(stack)
+                if prop.assign(v, bit) and prop.propagate():
+                    break
+            else:
+                return count
+
+    def __backjumpColorIterative(self, prop, ordering, stats, nogoods):
+        """
+        Search with conflict-directed backjumping on top of a ReasonPropagator.
+        Each stack frame is [vertex, colours not tried yet, conflict set,
+        trail mark of the current colour, domain of the vertex when chosen].
+
+        A failed colour adds to the conflict set of its vertex the searched
+        vertices the failure traces back to (prop.explain), or the vertices of
+        a stored nogood it completes. When a vertex runs out of colours, its
+        conflict set and the vertices that pruned its domain hold everything
+        to blame : the search jumps straight back to the deepest of them,
+        skipping the frames in between, and stores their colouring as a
+        nogood. An empty set means the board has no solution.
+        When that does not pay (see BACKJUMP_PROBE) the search stops explaining
+        failures and backtracks chronologically, like the propagate search.
+        """
+        totalV = self.totalV
+        onAssign, onBacktrack = stats.onAssign, stats.onBacktrack
+        budget = stats.budget
+        pickValue = stats.pickValue
+        tieBreak = prop.udeg if stats.tieBreak is None else stats.tieBreak
+        color, level, removedBy = prop.color, prop.level, prop.removedBy
+        full = prop.full
+        learning = True
+        deadEnds = 0
+        stack = []
+        while True:
+            if ordering == "static":
+                v = next((v for v in range(1, totalV + 1) if color[v] == 0), None)
+            else:
+                v = prop.queue.peekBest(tieBreak)
+            if v is None:
+                return True
+            stack.append([v, prop.domain[v], set(), None, prop.domain[v]])
+            stats.visited += 1
+            if len(stack) > stats.maxDepth:
+                stats.maxDepth = len(stack)
+
+            while True:
+                frame = stack[-1]
+                v, free, conflicts, mark = frame[0], frame[1], frame[2], frame[3]
+                if mark is not None:
+                    if onBacktrack is not None:
+                        onBacktrack(v, color[v], len(stack))
+                    prop.undo(mark)
+                    frame[3] = None
+                    stats.backtracks += 1
+                if not free and not learning:
+                    stack.pop()
+                    if not stack:
+                        return False
+                    continue
+                if not free:
+                    deadEnds += 1
+                    pruned = full & ~frame[4]
+                    blamed = conflicts.union(prop.explain(
+                        [removedBy[v][c] for c in range(1, prop.m + 1) if pruned & (1 << (c - 1))]))
+                    blamed.discard(v)
+                    if not blamed:
+                        return False
+                    nogoods.add([(u, color[u]) for u in blamed])
+                    stats.nogoods = len(nogoods)
+                    target = max(blamed, key=level.__getitem__)
+                    stack.pop()
+                    while stack[-1][0] != target:
+                        if onBacktrack is not None:
+                            onBacktrack(stack[-1][0], color[stack[-1][0]], len(stack))
+                        prop.undo(stack.pop()[3])
+                        stats.backjumps += 1
+                    blamed.discard(target)
+                    stack[-1][2].update(blamed)
+                    if deadEnds == BACKJUMP_PROBE:
+                        learning = stats.backjumps + stats.nogoodHits >= BACKJUMP_MIN_GAIN * deadEnds
+                    continue
+
+                bit = free & -free if pickValue is None else pickValue(v, free)
+                frame[1] = free ^ bit
+                stats.nodes += 1
+                if stats.nodes >= budget.nextCheck:
+                    budget.check(stats.nodes)
+                frame[3] = prop.mark()
+                c = bit.bit_length()
+                if onAssign is not None:
+                    onAssign(v, c, len(stack))
+                prop.depth = len(stack)
+                if prop.assign(v, bit) and prop.propagate():
+                    matched = nogoods.check(v, c, color) if learning and len(nogoods) else None
+                    if matched is None:
+                        break
+                    stats.nogoodHits += 1
+                    failure = matched
+                else:
+                    failure = prop.conflict
+                if learning:
+                    conflicts.update(prop.explain(failure))
+                    conflicts.discard(v)
+
+
+_sharedSolvers = dict()  # boxSize : SudokuSolver
+
+
+def getSolver(boxSize=4):
+    """
+    Returns the SudokuSolver of the box size, built on the first call and
+    then shared by every caller in the process like getSudokuConnections.
+    A solve keeps its state in local variables, so one solver serves every
+    board of its size.
+    """
+    solver = _sharedSolvers.get(boxSize)
+    if solver is None:
+        solver = _sharedSolvers[boxSize] = SudokuSolver(boxSize=boxSize)
+    return solver
@@ -1,13 +1,19 @@
 from graph import Graph
 
 class SudokuConnections : 
-    def __init__(self) :  # constructor
+    def __init__(self, boxSize=4, graphType=Graph) :  # constructor
+        """
+        boxSize : side of a block, the board is boxSize^2 x boxSize^2
+                  (3 for 9x9, 4 for 16x16, 5 for 25x25, 6 for 36x36)
+        graphType : Graph (dict based) or CSRGraph (flat arrays)
+        """
 
-        self.graph = Graph() # Graph Object
+        self.graph = graphType() # Graph Object
 
-        self.rows = 16
-        self.cols = 16
-        self.total_blocks = self.rows*self.cols #81
+        self.boxSize = boxSize
+        self.rows = boxSize * boxSize
+        self.cols = boxSize * boxSize
+        self.total_blocks = self.rows*self.cols #256 for 16x16
 
         self.__generateGraph() # Generates all the nodes
         self.connectEdges() # connects all the nodes acc to sudoku constraints
@@ -18,7 +24,7 @@ class SudokuConnections :
 
     def __generateGraph(self) : 
         """
-        Generates nodes with id from 1 to 256.
+        Generates nodes with id from 1 to rows*cols.
         Both inclusive
         """
         for idx in range(1, self.total_blocks+1) : 
@@ -30,8 +36,8 @@ class SudokuConnections :
 
         head_connections = dict() # head : connections
 
-        for row in range(16) :
-            for col in range(16) : 
+        for row in range(self.rows) :
+            for col in range(self.cols) : 
                 
                 head = matrix[row][col] #id of the node
                 connections = self.__whatToConnect(matrix, row, col)
@@ -42,11 +48,14 @@ class SudokuConnections :
         self.__connectThose(head_connections=head_connections)
         
     def __connectThose(self, head_connections) : 
+        """
+        __whatToConnect already gives every neighbour of a head, in both
+        directions, so the adjacency of each node is set in one go instead
+        of adding the edges one by one.
+        """
         for head in head_connections.keys() : #head is the start idx
             connections = head_connections[head]
-            for key in connections :  #get list of all the connections
-                for v in connections[key] : 
-                    self.graph.addEdge(src=head, dst=v)
+            self.graph.setNeighbours(head, connections["rows"] + connections["cols"] + connections["blocks"])
 
  
     def __whatToConnect(self, matrix, rows, cols) :
@@ -55,275 +64,34 @@ class SudokuConnections :
         matrix : stores the id of each node representing each cell
         returns dictionary
         connections - dictionary
-        rows : [all the ids in the rows]
-        cols : [all the ids in the cols]
-        blocks : [all the ids in the block]
+        rows : [all the other ids in the row]
+        cols : [all the other ids in the col]
+        blocks : [the ids in the block which are not in the same row or col]
         
         ** to be connected to the head.
+        The block of a cell is found arithmetically from the box size.
         """
         connections = dict()
-
-        row = []
-        col = []
-        block = []
+        n = self.boxSize
 
         # ROWS
-        for c in range(cols+1, 16) : 
-            row.append(matrix[rows][c])
-        
-        connections["rows"] = row
+        connections["rows"] = [matrix[rows][c] for c in range(self.cols) if c != cols]
 
         # COLS 
-        for r in range(rows+1, 16):
-            col.append(matrix[r][cols])
-        
-        connections["cols"] = col
+        connections["cols"] = [matrix[r][cols] for r in range(self.rows) if r != rows]
 
         # BLOCKS
-        
-        if rows%4 == 0 : 
-
-            if cols%4 == 0 :
-                
-                block.append(matrix[rows+1][cols+1])
-                block.append(matrix[rows+1][cols+2])
-                block.append(matrix[rows+1][cols+3])
-
-                block.append(matrix[rows+2][cols+1])
-                block.append(matrix[rows+2][cols+2])
-                block.append(matrix[rows+2][cols+3])
-
-                block.append(matrix[rows+3][cols+1])
-                block.append(matrix[rows+3][cols+2])
-                block.append(matrix[rows+3][cols+3])
-                
-            elif cols%4 == 1 :
-                
-                block.append(matrix[rows+1][cols-1])
-                block.append(matrix[rows+1][cols+1])
-                block.append(matrix[rows+1][cols+2])
-
-                block.append(matrix[rows+2][cols-1])
-                block.append(matrix[rows+2][cols+1])
-                block.append(matrix[rows+2][cols+2])
-
-                block.append(matrix[rows+3][cols-1])
-                block.append(matrix[rows+3][cols+1])
-                block.append(matrix[rows+3][cols+2])
-                
-            elif cols%4 == 2 :
-                
-                block.append(matrix[rows+1][cols-2])
-                block.append(matrix[rows+1][cols-1])
-                block.append(matrix[rows+1][cols+1])
-
-                block.append(matrix[rows+2][cols-2])
-                block.append(matrix[rows+2][cols-1])
-                block.append(matrix[rows+2][cols+1])
-
-                block.append(matrix[rows+3][cols-2])
-                block.append(matrix[rows+3][cols-1])
-                block.append(matrix[rows+3][cols+1])
-
-            elif cols%4 == 3 :
-
-                block.append(matrix[rows+1][cols-3])
-                block.append(matrix[rows+1][cols-2])
-                block.append(matrix[rows+1][cols-1])
-
-                block.append(matrix[rows+2][cols-3])
-                block.append(matrix[rows+2][cols-2])
-                block.append(matrix[rows+2][cols-1])
-
-                block.append(matrix[rows+3][cols-3])
-                block.append(matrix[rows+3][cols-2])
-                block.append(matrix[rows+3][cols-1])
-
-
-        elif rows%4 == 1 :
-            
-            if cols%4 == 0 :
-                
-                block.append(matrix[rows-1][cols+1])
-                block.append(matrix[rows-1][cols+2])
-                block.append(matrix[rows-1][cols+3])
-
-                block.append(matrix[rows+1][cols+1])
-                block.append(matrix[rows+1][cols+2])
-                block.append(matrix[rows+1][cols+3])
-
-                block.append(matrix[rows+2][cols+1])
-                block.append(matrix[rows+2][cols+2])
-                block.append(matrix[rows+2][cols+3])
-
-            elif cols%4 == 1 :
-                
-                block.append(matrix[rows-1][cols-1])
-                block.append(matrix[rows-1][cols+1])
-                block.append(matrix[rows-1][cols+2])
-
-                block.append(matrix[rows+1][cols-1])
-                block.append(matrix[rows+1][cols+1])
-                block.append(matrix[rows+1][cols+2])
-
-                block.append(matrix[rows+2][cols-1])
-                block.append(matrix[rows+2][cols+1])
-                block.append(matrix[rows+2][cols+2])
-                
-            elif cols%4 == 2 :
-                
-                block.append(matrix[rows-1][cols-2])
-                block.append(matrix[rows-1][cols-1])
-                block.append(matrix[rows-1][cols+1])
-
-                block.append(matrix[rows+1][cols-2])
-                block.append(matrix[rows+1][cols-1])
-                block.append(matrix[rows+1][cols+1])
-
-                block.append(matrix[rows+2][cols-2])
-                block.append(matrix[rows+2][cols-1])
-                block.append(matrix[rows+2][cols+1])
-
-            elif cols%4 == 3:
-
-                block.append(matrix[rows-1][cols-3])
-                block.append(matrix[rows-1][cols-2])
-                block.append(matrix[rows-1][cols-1])
-
-                block.append(matrix[rows+1][cols-3])
-                block.append(matrix[rows+1][cols-2])
-                block.append(matrix[rows+1][cols-1])
-
-                block.append(matrix[rows+2][cols-3])
-                block.append(matrix[rows+2][cols-2])
-                block.append(matrix[rows+2][cols-1])
+        top = (rows // n) * n
+        left = (cols // n) * n
+        connections["blocks"] = [matrix[r][c]
+                                 for r in range(top, top + n) if r != rows
+                                 for c in range(left, left + n) if c != cols]
 
-
-        elif rows%4 == 2 :
-            
-            if cols%4 == 0 :
-                
-                block.append(matrix[rows-2][cols+1])
-                block.append(matrix[rows-2][cols+2])
-                block.append(matrix[rows-2][cols+3])
-
-                block.append(matrix[rows-1][cols+1])
-                block.append(matrix[rows-1][cols+2])
-                block.append(matrix[rows-1][cols+3])
-
-                block.append(matrix[rows+1][cols+1])
-                block.append(matrix[rows+1][cols+2])
-                block.append(matrix[rows+1][cols+3])
-
-
-            elif cols%4 == 1 :
-                
-                block.append(matrix[rows-2][cols-1])
-                block.append(matrix[rows-2][cols+1])
-                block.append(matrix[rows-2][cols+2])
-
-                block.append(matrix[rows-1][cols-1])
-                block.append(matrix[rows-1][cols+1])
-                block.append(matrix[rows-1][cols+2])
-
-                block.append(matrix[rows+1][cols-1])
-                block.append(matrix[rows+1][cols+1])
-                block.append(matrix[rows+1][cols+2])
-                
-            elif cols%4 == 2 :
-                
-                block.append(matrix[rows-2][cols-2])
-                block.append(matrix[rows-2][cols-1])
-                block.append(matrix[rows-2][cols+1])
-
-                block.append(matrix[rows-1][cols-2])
-                block.append(matrix[rows-1][cols-1])
-                block.append(matrix[rows-1][cols+1])
-
-                block.append(matrix[rows+1][cols-2])
-                block.append(matrix[rows+1][cols-1])
-                block.append(matrix[rows+1][cols+1])
-
-            elif cols%4 == 3:
-
-                block.append(matrix[rows-2][cols-3])
-                block.append(matrix[rows-2][cols-2])
-                block.append(matrix[rows-2][cols-1])
-
-                block.append(matrix[rows-1][cols-3])
-                block.append(matrix[rows-1][cols-2])
-                block.append(matrix[rows-1][cols-1])
-
-                block.append(matrix[rows+1][cols-3])
-                block.append(matrix[rows+1][cols-2])
-                block.append(matrix[rows+1][cols-1])
-
-
-        elif rows%4 == 3:
-
-            if cols%4 == 0 :
-
-                block.append(matrix[rows-3][cols+1])
-                block.append(matrix[rows-3][cols+2])
-                block.append(matrix[rows-3][cols+3])
-                
-                block.append(matrix[rows-2][cols+1])
-                block.append(matrix[rows-2][cols+2])
-                block.append(matrix[rows-2][cols+3])
-
-                block.append(matrix[rows-1][cols+1])
-                block.append(matrix[rows-1][cols+2])
-                block.append(matrix[rows-1][cols+3])
-
-
-            elif cols%4 == 1 :
-                
-                block.append(matrix[rows-3][cols-1])
-                block.append(matrix[rows-3][cols+1])
-                block.append(matrix[rows-3][cols+2])
-                
-                block.append(matrix[rows-2][cols-1])
-                block.append(matrix[rows-2][cols+1])
-                block.append(matrix[rows-2][cols+2])
-
-                block.append(matrix[rows-1][cols-1])
-                block.append(matrix[rows-1][cols+1])
-                block.append(matrix[rows-1][cols+2])
-                
-            elif cols%4 == 2 :
-                
-                block.append(matrix[rows-3][cols-2])
-                block.append(matrix[rows-3][cols-1])
-                block.append(matrix[rows-3][cols+1])
-                
-                block.append(matrix[rows-2][cols-2])
-                block.append(matrix[rows-2][cols-1])
-                block.append(matrix[rows-2][cols+1])
-
-                block.append(matrix[rows-1][cols-2])
-                block.append(matrix[rows-1][cols-1])
-                block.append(matrix[rows-1][cols+1])
-
-            elif cols%4 == 3:
-
-                block.append(matrix[rows-3][cols-3])
-                block.append(matrix[rows-3][cols-2])
-                block.append(matrix[rows-3][cols-1])
-                
-                block.append(matrix[rows-2][cols-3])
-                block.append(matrix[rows-2][cols-2])
-                block.append(matrix[rows-2][cols-1])
-
-                block.append(matrix[rows-1][cols-3])
-                block.append(matrix[rows-1][cols-2])
-                block.append(matrix[rows-1][cols-1])
-
-        
-        connections["blocks"] = block
         return connections
+
     def __getGridMatrix(self) : 
         """
-        Generates the 16x16 grid or matrix consisting of node ids.
+        Generates the rows x cols grid or matrix consisting of node ids.
         
         This matrix will act as a mapper of each cell with each node 
         through node ids
@@ -332,10 +100,27 @@ class SudokuConnections :
         for rows in range(self.rows)]
 
         count = 1
-        for rows in range(16) :
-            for cols in range(16):
+        for rows in range(self.rows) :
+            for cols in range(self.cols):
                 matrix[rows][cols] = count
                 count+=1
         return matrix
-    
 
+
+_sharedConnections = dict() # (boxSize, graphType) : frozen SudokuConnections
+
+def getSudokuConnections(boxSize=4, graphType=Graph) : 
+    """
+    Returns the frozen SudokuConnections of the given box size and graph type.
+    It is built on the first call and then shared by every caller in the
+    process, so the graph must be treated as read only (Graph.freeze
+    enforces it).
+    """
+    key = (boxSize, graphType)
+    connections = _sharedConnections.get(key)
+    if connections is None : 
+        connections = SudokuConnections(boxSize, graphType)
+        connections.graph.freeze()
+        connections.allIds = connections.graph.getAllNodesIds()
+        _sharedConnections[key] = connections
+    return connections
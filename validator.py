@@ -0,0 +1,83 @@
+
+def _unitsAreClean(board, size, boxSize):
+    """
+    Fast path of findConflicts : every unit is checked with set() and
+    list.count() in C, only boards that fail it get the cell by cell pass.
+    """
+    units = list(board) + list(zip(*board))
+    for top in range(0, size, boxSize):
+        band = board[top:top + boxSize]
+        for left in range(0, size, boxSize):
+            box = []
+            for row in band:
+                box += row[left:left + boxSize]
+            units.append(box)
+    for unit in units:
+        blanks = unit.count(0)
+        if len(set(unit)) != size - blanks + (1 if blanks else 0):
+            return False
+    return min(map(min, board)) >= 0 and max(map(max, board)) <= size
+
+
+def findConflicts(board):
+    """
+    Checks every row, column and block of the board in one pass.
+    Each unit keeps a bitset of the digits seen so far, so a repeated digit
+    is found with a single AND. 0 is a blank.
+
+    Returns the sorted list of (row, col) cells that break a rule : both
+    cells of every repeated digit and every value outside 0..N.
+    An empty list means the clues are consistent (not that a solution exists).
+    """
+    size = len(board)
+    boxSize = int(round(size ** 0.5))
+    if boxSize * boxSize != size or any(len(row) != size for row in board):
+        raise ValueError("A board must be N x N with N a square, got %d rows" % size)
+    if _unitsAreClean(board, size, boxSize):
+        return []
+
+    rowSeen = [0] * size
+    colSeen = [0] * size
+    boxSeen = [0] * size
+    firstCell = dict()  # (unit kind, unit, digit) : first cell holding it
+    conflicts = set()
+    for row in range(size):
+        for col in range(size):
+            value = board[row][col]
+            if value == 0:
+                continue
+            if not 1 <= value <= size:
+                conflicts.add((row, col))
+                continue
+            bit = 1 << (value - 1)
+            box = (row // boxSize) * boxSize + col // boxSize
+            for kind, seen, unit in ((0, rowSeen, row), (1, colSeen, col), (2, boxSeen, box)):
+                if seen[unit] & bit:
+                    conflicts.add((row, col))
+                    conflicts.add(firstCell[(kind, unit, value)])
+                else:
+                    seen[unit] |= bit
+                    firstCell[(kind, unit, value)] = (row, col)
+    return sorted(conflicts)
+
+
+def isValidBoard(board):
+    """ True when no clue of the board clashes with another """
+    return not findConflicts(board)
+
+
+def findConflictsBatch(boards):
+    """
+    findConflicts for a list of boards. With NumPy installed the whole
+    batch is checked in one vectorized pass (vectorized.conflictMask).
+    Returns one list of conflicting cells per board.
+    """
+    try:
+        import vectorized
+    except ImportError:
+        vectorized = None
+    boards = list(boards)
+    if vectorized is None or not boards or len(set(len(board) for board in boards)) != 1:
+        return [findConflicts(board) for board in boards]
+    mask = vectorized.conflictMask(boards)
+    return [[(int(row), int(col)) for row, col in zip(*cells.nonzero())] for cells in mask]
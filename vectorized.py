@@ -0,0 +1,138 @@
+import numpy as np
+
+'''
+Whole-board propagation with NumPy, for one board or a stack of boards.
+A stack is an int8 array of shape (B, N, N), 0 for a blank. Candidates are
+a boolean one-hot tensor of shape (B, N, N, N) where cand[b, r, c, d] tells
+whether digit d+1 is still possible in cell (r, c) of board b. Row, column
+and block eliminations are reductions over that tensor, no Python loop
+runs over the cells.
+'''
+
+SOLVED = 1
+OPEN = 0
+CONTRADICTION = -1
+
+
+def toArray(boards):
+    """
+    Converts a board (list of rows) or a list of boards into an int8 stack
+    of shape (B, N, N). Arrays are passed through.
+    """
+    grid = np.asarray(boards, dtype=np.int8)
+    if grid.ndim == 2:
+        grid = grid[None]
+    if grid.ndim != 3 or grid.shape[1] != grid.shape[2]:
+        raise ValueError("Expected boards of shape (N, N) or (B, N, N)")
+    return grid
+
+
+def _boxSize(size):
+    boxSize = int(round(size ** 0.5))
+    if boxSize * boxSize != size:
+        raise ValueError("The side of a board must be a square, got " + str(size))
+    return boxSize
+
+
+def unitCounts(onehot):
+    """
+    Sums a (B, N, N, N) tensor over every unit.
+    Returns (rows, cols, boxes), each (B, N, N) : [board, unit, digit].
+    """
+    B, N = onehot.shape[0], onehot.shape[1]
+    n = _boxSize(N)
+    rows = onehot.sum(axis=2, dtype=np.int16)
+    cols = onehot.sum(axis=1, dtype=np.int16)
+    boxes = onehot.reshape(B, n, n, n, n, N).sum(axis=(2, 4), dtype=np.int16).reshape(B, N, N)
+    return rows, cols, boxes
+
+
+def _boxSpread(boxes, n):
+    """ (B, N, N) per block values -> (B, N, N, N) per cell values """
+    B, N = boxes.shape[0], boxes.shape[1]
+    spread = boxes.reshape(B, n, 1, n, 1, N)
+    return np.broadcast_to(spread, (B, n, n, n, n, N)).reshape(B, N, N, N)
+
+
+def conflictMask(boards):
+    """
+    Returns a boolean (B, N, N) mask of the cells whose digit appears more
+    than once in their row, column or block, or is outside 0..N.
+    """
+    grid = toArray(boards)
+    N = grid.shape[1]
+    n = _boxSize(N)
+    onehot = grid[..., None] == np.arange(1, N + 1, dtype=np.int8)
+    rows, cols, boxes = unitCounts(onehot)
+    repeated = (rows[:, :, None, :] > 1) | (cols[:, None, :, :] > 1) | _boxSpread(boxes > 1, n)
+    return (onehot & repeated).any(axis=3) | (grid < 0) | (grid > N)
+
+
+def candidates(grid):
+    """
+    Returns the one-hot (B, N, N, N) candidates of a stack of boards.
+    A filled cell has only its own digit, a blank cell every digit not
+    yet used in its row, column or block.
+    """
+    grid = toArray(grid)
+    N = grid.shape[1]
+    n = _boxSize(N)
+    digits = np.arange(1, N + 1, dtype=np.int8)
+    onehot = grid[..., None] == digits
+    rows, cols, boxes = unitCounts(onehot)
+    used = (rows[:, :, None, :] > 0) | (cols[:, None, :, :] > 0) | _boxSpread(boxes > 0, n)
+    return np.where((grid == 0)[..., None], ~used, onehot)
+
+
+def propagate(boards, maxRounds=None):
+    """
+    Runs naked and hidden singles on every board of the stack at once until
+    no board changes any more.
+
+    Returns (grid, status) : the propagated int8 stack and, per board,
+    SOLVED, OPEN (needs search) or CONTRADICTION. The input is not modified.
+    """
+    grid = toArray(boards).copy()
+    B, N = grid.shape[0], grid.shape[1]
+    n = _boxSize(N)
+    digits = np.arange(1, N + 1, dtype=np.int8)
+    status = np.zeros(B, dtype=np.int8)
+    rounds = 0
+    while maxRounds is None or rounds < maxRounds:
+        rounds += 1
+        active = status == OPEN
+        onehot = grid[..., None] == digits
+        placedRows, placedCols, placedBoxes = unitCounts(onehot)
+        cand = candidates(grid)
+        candRows, candCols, candBoxes = unitCounts(cand & (grid == 0)[..., None])
+
+        blank = grid == 0
+        count = cand.sum(axis=3)
+        clash = ((placedRows > 1).any(axis=(1, 2)) | (placedCols > 1).any(axis=(1, 2)) |
+                 (placedBoxes > 1).any(axis=(1, 2)))
+        empty = (blank & (count == 0)).any(axis=(1, 2))
+        missing = (((placedRows == 0) & (candRows == 0)).any(axis=(1, 2)) |
+                   ((placedCols == 0) & (candCols == 0)).any(axis=(1, 2)) |
+                   ((placedBoxes == 0) & (candBoxes == 0)).any(axis=(1, 2)))
+        status[active & (clash | empty | missing)] = CONTRADICTION
+        status[active & ~blank.any(axis=(1, 2)) & (status == OPEN)] = SOLVED
+        active = status == OPEN
+        if not active.any():
+            break
+
+        # naked singles : blank cells with one candidate left
+        naked = blank & (count == 1) & active[:, None, None]
+        new = np.where(naked, cand.argmax(axis=3) + 1, 0).astype(np.int8)
+
+        # hidden singles : digits with one possible cell in a unit
+        hidden = cand & blank[..., None] & active[:, None, None, None] & (
+            ((candRows == 1) & (placedRows == 0))[:, :, None, :] |
+            ((candCols == 1) & (placedCols == 0))[:, None, :, :] |
+            _boxSpread((candBoxes == 1) & (placedBoxes == 0), n))
+        hiddenCells = hidden.any(axis=3) & (new == 0)
+        new = np.where(hiddenCells, hidden.argmax(axis=3) + 1, new).astype(np.int8)
+
+        if not new.any():
+            break
+        grid = np.where(new > 0, new, grid)
+    return grid, status